@@ -0,0 +1,278 @@
+# benchmark.py
+
+import os
+import random
+import string
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from main import QRCodeCache, QRCodeGenerator, numpy
+
+
+def measure(function, min_time=0.2):
+    # Run function until min_time is spent, return the mean seconds per call
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+
+    return elapsed / calls
+
+
+def bench_rs_batch():
+    # Reed-Solomon throughput of the pure Python engine and the NumPy batch path
+    # for blocks sharing the same layout (same version and error correction level)
+    print('Reed-Solomon batch encoding (codewords per second)')
+    for version, error_correction in ((5, 'Q'), (40, 'L')):
+        nsym, _, block_length = QRCodeGenerator.ECCWBI[version][error_correction][:3]
+
+        for blocks_count in (1, 100, 10000):
+            data = os.urandom(blocks_count * block_length)
+            blocks = [data[i:i + block_length] for i in range(0, len(data), block_length)]
+            codewords = blocks_count * (block_length + nsym)
+
+            python_time = measure(lambda: QRCodeGenerator.rs_encode_blocks(blocks, nsym))
+            label = f'{version}-{error_correction}'
+            line = f'  {label:<5} N={blocks_count:<6} python: {codewords / python_time:>14,.0f}'
+
+            if numpy is not None:
+                array = numpy.frombuffer(data, dtype=numpy.uint8).reshape(blocks_count, block_length)
+
+                # Results must be identical to the scalar path
+                expected = QRCodeGenerator.rs_encode_blocks(blocks, nsym)
+                if QRCodeGenerator.rs_encode_batch(array, nsym).tobytes() != b''.join(expected):
+                    raise AssertionError('NumPy batch result differs from the pure Python result')
+
+                numpy_time = measure(lambda: QRCodeGenerator.rs_encode_batch(array, nsym))
+                line += f'  numpy: {codewords / numpy_time:>14,.0f}'
+
+            print(line)
+
+
+def bench_templates():
+    # Function pattern template per version: cold build (empty cache) and warm start (copy of the cached template)
+    print('Function pattern templates (microseconds per symbol)')
+    for version in (1, 5, 10, 20, 30, 40):
+        def build_cold():
+            QRCodeGenerator._FUNCTION_TEMPLATES.pop(version, None)
+            QRCodeGenerator.get_function_template(version)
+
+        cold_time = measure(build_cold)
+        warm_time = measure(lambda: QRCodeGenerator.get_function_template(version).copy())
+        print(f'  version {version:<3} cold: {cold_time * 1e6:>10.1f}  warm: {warm_time * 1e6:>8.2f}')
+
+
+def naive_penalty(matrix):
+    # Per-module reference implementation of the N1-N4 penalty rules on a list of lists
+    size = len(matrix)
+    columns = [[matrix[y][x] for y in range(size)] for x in range(size)]
+    score = 0
+
+    for line in matrix + columns:
+        # N1
+        run_length = 1
+        for i in range(1, size + 1):
+            if i < size and line[i] == line[i - 1]:
+                run_length += 1
+            else:
+                if run_length >= 5:
+                    score += run_length - 2
+                run_length = 1
+
+        # N3, modules outside the matrix are light
+        padded_line = [0] * 4 + line + [0] * 4
+        for i in range(4, size - 2):
+            if padded_line[i:i + 7] == [1, 0, 1, 1, 1, 0, 1]:
+                if padded_line[i - 4:i] == [0] * 4 or padded_line[i + 7:i + 11] == [0] * 4:
+                    score += 40
+
+    # N2
+    for y in range(size - 1):
+        for x in range(size - 1):
+            if matrix[y][x] == matrix[y][x + 1] == matrix[y + 1][x] == matrix[y + 1][x + 1]:
+                score += 3
+
+    # N4
+    dark_modules = sum(map(sum, matrix))
+    score += 10 * int(abs(dark_modules * 100 / (size * size) - 50) / 5)
+
+    return score
+
+
+def naive_select_mask(generator, qr_matrix):
+    # Apply every mask module by module, write its format information and score the finished symbol with the naive rules
+    size = qr_matrix.size
+    best_score = None
+    for mask_pattern, mask_function in enumerate(QRCodeGenerator.MASK_PATTERNS):
+        matrix = [
+            [qr_matrix.get(x, y) ^ (not qr_matrix.is_function(x, y) and mask_function(x, y)) for x in range(size)]
+            for y in range(size)
+        ]
+        format_information = QRCodeGenerator.get_format_information(generator.error_correction, mask_pattern)
+        for positions in QRCodeGenerator.FORMAT_INFORMATION_POSITIONS:
+            for i, (x, y) in enumerate(positions):
+                matrix[y % size][x % size] = format_information >> i & 1
+
+        score = naive_penalty(matrix)
+        if best_score is None or score < best_score:
+            best_score = score
+            best_mask_pattern = mask_pattern
+
+    return best_mask_pattern
+
+
+def prepare_matrix(version, error_correction='M'):
+    # Unmasked matrix of a random lowercase (byte mode) payload filling the given version
+    capacity = QRCodeGenerator.CAPACITIES_TABLE[version][error_correction]['byte']
+    data = ''.join(random.choices(string.ascii_lowercase, k=capacity))
+    generator = QRCodeGenerator(data, error_correction)
+    generator.determine_best_encoding_mode()
+    generator.determine_smallest_version()
+
+    return generator, generator.generate_matrix(generator.apply_error_correction())
+
+
+def bench_masks():
+    # Mask selection per version: packed planes against a per-module implementation
+    print('Mask selection (milliseconds per symbol)')
+    for version in (1, 5, 10, 20, 30, 40):
+        generator, qr_matrix = prepare_matrix(version)
+        planes_time = measure(lambda: generator.determine_best_mask_pattern(qr_matrix))
+        naive_time = measure(lambda: naive_select_mask(generator, qr_matrix), min_time=0)
+
+        # Both implementations must choose the same mask
+        if naive_select_mask(generator, qr_matrix) != generator.determine_best_mask_pattern(qr_matrix):
+            raise AssertionError('Packed and per-module mask selection differ')
+
+        print(f'  version {version:<3} planes: {planes_time * 1e3:>8.2f}  naive: {naive_time * 1e3:>9.1f}  speedup: {naive_time / planes_time:>6.1f}x')
+
+
+def bench_profiles():
+    # Whole symbol generation throughput of every quality profile, with a random lowercase payload filling each version
+    print('Quality profiles (symbols per second)')
+    for version in (1, 5, 10, 20, 30, 40):
+        capacity = QRCodeGenerator.CAPACITIES_TABLE[version]['M']['byte']
+        data = ''.join(random.choices(string.ascii_lowercase, k=capacity))
+
+        line = f'  version {version:<3}'
+        for quality in QRCodeGenerator.QUALITY_PROFILES:
+            profile_time = measure(lambda: QRCodeGenerator(data, 'M', quality=quality, mask_pattern=0).generate_qr_code())
+            line += f' {quality}: {1 / profile_time:>8,.0f}'
+
+        print(line)
+
+
+def bench_svg():
+    # SVG size and render time per version, against the size of one <rect> per dark module
+    print('SVG rendering (bytes and milliseconds per symbol)')
+    for version in (1, 5, 10, 20, 30, 40):
+        capacity = QRCodeGenerator.CAPACITIES_TABLE[version]['M']['byte']
+        generator = QRCodeGenerator(''.join(random.choices(string.ascii_lowercase, k=capacity)), 'M')
+        qr_matrix = generator.generate_qr_code()
+
+        svg_bytes = len(''.join(generator.iter_svg()).encode())
+        render_time = measure(lambda: ''.join(generator.iter_svg()))
+        rect_bytes = len(''.join(
+            f'<rect x="{x + 4}" y="{y + 4}" width="1" height="1"/>'
+            for y in range(qr_matrix.size) for x in range(qr_matrix.size) if qr_matrix.get(x, y)
+        ))
+        print(f'  version {version:<3} path: {svg_bytes:>7,} bytes {render_time * 1e3:>6.2f} ms  rects: {rect_bytes:>9,} bytes')
+
+
+def bench_many():
+    # generate_many throughput from 1 worker process to one per CPU, on random lowercase payloads
+    print(f'Batch generation (symbols per second, {os.cpu_count()} CPUs)')
+    payloads = [''.join(random.choices(string.ascii_lowercase, k=random.randint(20, 300))) for _ in range(2000)]
+    expected = list(QRCodeGenerator.generate_many(payloads, 'M', workers=1))
+
+    workers = 1
+    while True:
+        start = time.perf_counter()
+        results = list(QRCodeGenerator.generate_many(payloads, 'M', workers=workers))
+        elapsed = time.perf_counter() - start
+
+        # Results must come back complete and in order
+        if results != expected:
+            raise AssertionError('generate_many results differ from the single process results')
+
+        if workers == 1:
+            single_elapsed = elapsed
+        print(f'  workers {workers:<3} {len(payloads) / elapsed:>8,.0f}  speedup: {single_elapsed / elapsed:>5.2f}x')
+
+        if workers >= os.cpu_count():
+            break
+        workers = min(workers * 2, os.cpu_count())
+
+
+def bench_threads():
+    # Stress and throughput of concurrent QRCodeGenerator.encode calls from a thread pool
+    # Every run starts with empty shared caches, so the tables are also built concurrently,
+    # and the results must be identical to the sequential ones
+    gil = 'enabled' if getattr(sys, '_is_gil_enabled', lambda: True)() else 'disabled'
+    print(f'Threaded encoding (symbols per second, GIL {gil})')
+    payloads = [''.join(random.choices(string.ascii_lowercase, k=random.randint(20, 300))) for _ in range(1000)]
+    expected = [QRCodeGenerator.encode(data, 'M') for data in payloads]
+
+    for threads in (1, 2, 4, 8, 16):
+        for name, cache in vars(QRCodeGenerator).items():
+            if name.startswith('_') and isinstance(cache, dict):
+                cache.clear()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            results = list(executor.map(lambda data: QRCodeGenerator.encode(data, 'M'), payloads))
+        elapsed = time.perf_counter() - start
+
+        if results != expected:
+            raise AssertionError('Threaded results differ from the sequential results')
+
+        if threads == 1:
+            single_elapsed = elapsed
+        print(f'  threads {threads:<3} {len(payloads) / elapsed:>8,.0f}  speedup: {single_elapsed / elapsed:>5.2f}x')
+
+
+def bench_cache():
+    # PNG rendering of repeated payloads (a few popular ones, many rare ones) with and without the two tier cache
+    print('Cached rendering (requests per second)')
+    popular = [''.join(random.choices(string.ascii_lowercase, k=60)) for _ in range(20)]
+    rare = [''.join(random.choices(string.ascii_lowercase, k=60)) for _ in range(2000)]
+    requests = [random.choice(popular) if random.random() < 0.8 else random.choice(rare) for _ in range(2000)]
+
+    start = time.perf_counter()
+    for data in requests:
+        QRCodeGenerator.generate_item(data, 'M', 'png', 10)
+    uncached_time = time.perf_counter() - start
+
+    for max_bytes in (16 * 1024, 256 * 1024, 16 * 1024 * 1024):
+        cache = QRCodeCache(max_bytes)
+        start = time.perf_counter()
+        for data in requests:
+            cache.render(data, 'M', 'png', 10)
+        cached_time = time.perf_counter() - start
+
+        image_counters = cache.get_stats()['image']
+        hit_rate = image_counters['hits'] / len(requests)
+        print(f'  budget {max_bytes // 1024:>6} KiB  uncached: {len(requests) / uncached_time:>8,.0f}  cached: {len(requests) / cached_time:>8,.0f}'
+              f'  hit rate: {hit_rate:>4.0%}  evictions: {image_counters["evictions"]}')
+
+
+BENCHMARKS = {
+    'rs_batch': bench_rs_batch,
+    'templates': bench_templates,
+    'masks': bench_masks,
+    'profiles': bench_profiles,
+    'svg': bench_svg,
+    'many': bench_many,
+    'threads': bench_threads,
+    'cache': bench_cache,
+}
+
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
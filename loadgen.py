@@ -0,0 +1,74 @@
+# loadgen.py
+
+import argparse
+import http.client
+import random
+import statistics
+import string
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+
+def run_connection(host, port, paths, latencies, errors):
+    # One keep-alive connection sending its requests one after the other
+    connection = http.client.HTTPConnection(host, port)
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # Reconnect on the next request
+            connection.close()
+            errors.append(None)
+            continue
+
+        if response.status == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(response.status)
+
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator for the main.py serve HTTP service')
+    parser.add_argument('--url', default='http://127.0.0.1:8000/qr')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8, help='parallel keep-alive connections')
+    parser.add_argument('--ec', default='M')
+    parser.add_argument('--fmt', default='png')
+    parser.add_argument('--length', type=int, default=60, help='payload length')
+    parser.add_argument('--unique', type=int, default=0, help='distinct payloads (default: every request is different)')
+    arguments = parser.parse_args()
+
+    url = urlsplit(arguments.url)
+    payload_count = arguments.unique or arguments.requests
+    payloads = [''.join(random.choices(string.ascii_letters + string.digits, k=arguments.length)) for _ in range(payload_count)]
+    paths = [f'{url.path}?data={quote(payloads[i % payload_count])}&ec={arguments.ec}&fmt={arguments.fmt}' for i in range(arguments.requests)]
+
+    latencies = []
+    errors = []
+    threads = [
+        threading.Thread(target=run_connection, args=(url.hostname, url.port or 80, paths[i::arguments.concurrency], latencies, errors))
+        for i in range(arguments.concurrency)
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f'{len(latencies)} requests in {elapsed:.2f} s over {arguments.concurrency} connections, {len(errors)} errors')
+    print(f'  throughput: {len(latencies) / elapsed:,.0f} req/s')
+    if len(latencies) >= 2:
+        percentiles = statistics.quantiles(latencies, n=100)
+        print(f'  latency p50: {percentiles[49] * 1e3:.2f} ms  p95: {percentiles[94] * 1e3:.2f} ms  p99: {percentiles[98] * 1e3:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,263 +1,543 @@
 # main.py
 
+import argparse
+import asyncio
+import re
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import chain, compress, groupby
+from multiprocessing import Pool
+from urllib.parse import parse_qs, urlsplit
+
+# NumPy is optional, it only enables the vectorised paths
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class BitBuffer:
+    # Packed bit writer: completed bytes go to a bytearray,
+    # the trailing partial byte is kept in an integer accumulator
+    def __init__(self):
+        self.buffer = bytearray()
+        self.accumulator = 0
+        self.accumulator_bits = 0
+
+    def __len__(self):
+        # Total number of bits written so far
+        return len(self.buffer) * 8 + self.accumulator_bits
+
+    def append(self, value, length):
+        # Append the lowest `length` bits of value, most significant bit first
+        accumulator = (self.accumulator << length) | value
+        accumulator_bits = self.accumulator_bits + length
+
+        # Flush every complete byte at once
+        if accumulator_bits >= 8:
+            remaining_bits = accumulator_bits & 7
+            self.buffer += (accumulator >> remaining_bits).to_bytes(accumulator_bits >> 3, 'big')
+            accumulator &= (1 << remaining_bits) - 1
+            accumulator_bits = remaining_bits
+
+        self.accumulator = accumulator
+        self.accumulator_bits = accumulator_bits
+
+    def append_bytes(self, data):
+        # Byte aligned data can be copied as is
+        if self.accumulator_bits == 0:
+            self.buffer += data
+        else:
+            self.append(int.from_bytes(data, 'big'), len(data) * 8)
+
+    def pad_to_byte(self):
+        # Fill the partial byte with 0s
+        if self.accumulator_bits:
+            self.append(0, 8 - self.accumulator_bits)
+
+    def to_bytearray(self):
+        # Emit the written bits as bytes, the last byte is padded with 0s
+        data = bytearray(self.buffer)
+        if self.accumulator_bits:
+            data.append(self.accumulator << (8 - self.accumulator_bits))
+
+        return data
+
+
+class QRMatrix:
+    # Square matrix of modules packed 8 per byte, every row padded to whole bytes
+    # The leftmost module of a row is the most significant bit of its first byte, dark module = 1
+    # function_mask has the same layout and marks the function pattern modules
+
+    # Characters of a string of bits to module bytes
+    UNPACKED_MODULES = bytes.maketrans(b'01', b'\x00\x01')
+
+    def __init__(self, size, modules=None, function_mask=None):
+        self.size = size
+        self.stride = (size + 7) // 8
+        self.padding = self.stride * 8 - size
+        self.modules = bytearray(self.stride * size) if modules is None else modules
+        self.function_mask = bytearray(self.stride * size) if function_mask is None else function_mask
+        # One byte per module copy of a read only (bytes storage) matrix, built on first use
+        self.unpacked_modules = None
+
+    def get(self, x, y):
+        return self.modules[y * self.stride + (x >> 3)] >> (7 - (x & 7)) & 1
+
+    def set(self, x, y, dark=1):
+        index = y * self.stride + (x >> 3)
+        if dark:
+            self.modules[index] |= 0x80 >> (x & 7)
+        else:
+            self.modules[index] &= ~(0x80 >> (x & 7))
+
+    def is_function(self, x, y):
+        return self.function_mask[y * self.stride + (x >> 3)] >> (7 - (x & 7)) & 1
+
+    def set_function(self, x, y, dark=1):
+        # Set a module and mark it as a function pattern module
+        self.set(x, y, dark)
+        self.function_mask[y * self.stride + (x >> 3)] |= 0x80 >> (x & 7)
+
+    def row(self, y):
+        # Row as an int, the leftmost module is the most significant bit
+        start = y * self.stride
+        return int.from_bytes(self.modules[start:start + self.stride], 'big') >> self.padding
+
+    def set_row(self, y, value):
+        start = y * self.stride
+        self.modules[start:start + self.stride] = (value << self.padding).to_bytes(self.stride, 'big')
+
+    def rows(self):
+        return [self.row(y) for y in range(self.size)]
+
+    def function_row(self, y):
+        start = y * self.stride
+        return int.from_bytes(self.function_mask[start:start + self.stride], 'big') >> self.padding
+
+    def column(self, x):
+        # Column as an int, the top module is the most significant bit
+        column = 0
+        index = x >> 3
+        shift = 7 - (x & 7)
+        for y in range(self.size):
+            column = (column << 1) | (self.modules[index] >> shift & 1)
+            index += self.stride
+
+        return column
+
+    def copy(self):
+        return QRMatrix(self.size, bytearray(self.modules), bytearray(self.function_mask))
+
+    def packbits(self):
+        # Zero-copy 2D view (size x stride bytes) of the packed modules, the layout of numpy.packbits(..., axis=1)
+        return memoryview(self.modules).cast('B', (self.size, self.stride))
+
+    def tobytes(self):
+        # One byte per module (dark = 1), row by row
+        # Matrices with bytes storage never change: their copy is built once and then shared
+        if self.unpacked_modules is not None:
+            return self.unpacked_modules
+
+        # All the packed modules are formatted at once, then the padding modules at the end of every row are dropped
+        size = self.size
+        row_length = self.stride * 8
+        bits = format(int.from_bytes(self.modules, 'big'), f'0{row_length * size}b').encode().translate(self.UNPACKED_MODULES)
+        unpacked_modules = b''.join(bits[start:start + size] for start in range(0, row_length * size, row_length))
+        if isinstance(self.modules, bytes):
+            self.unpacked_modules = unpacked_modules
+
+        return unpacked_modules
+
+    def unpackbits(self):
+        # 2D view (size x size bytes) of a one byte per module copy, the layout of numpy.unpackbits(...)[:, :size]
+        return memoryview(self.tobytes()).cast('B', (self.size, self.size))
+
+    @property
+    def __array_interface__(self):
+        # NumPy and other array libraries see the matrix as size x size uint8 modules (the cached copy of tobytes)
+        return {'shape': (self.size, self.size), 'typestr': '|u1', 'data': self.tobytes(), 'version': 3}
+
+    def __eq__(self, other):
+        if not isinstance(other, QRMatrix):
+            return NotImplemented
+
+        return self.size == other.size and self.modules == other.modules
+
+    def __hash__(self):
+        # Like bytes and bytearray: read only (bytes storage) matrices are hashable, writable ones are not
+        if not isinstance(self.modules, bytes):
+            raise TypeError(f"unhashable type: 'QRMatrix' with {type(self.modules).__name__} storage")
+
+        return hash((self.size, self.modules))
+
+
+# Immutable result of QRCodeGenerator.encode
+QRCode = namedtuple('QRCode', ('data', 'error_correction', 'version', 'encoding_mode', 'segments', 'mask_pattern', 'matrix'))
+
+
+class BufferWriter:
+    # Binary file-like writer into a bytearray (appending to it)
+    # or a writable memoryview (from its start, it never grows)
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.position = 0
+
+    def write(self, data):
+        end = self.position + len(data)
+        if isinstance(self.buffer, bytearray):
+            self.buffer += data
+        elif end > len(self.buffer):
+            raise ValueError(f'Output buffer is too small: {len(self.buffer)} bytes')
+        else:
+            self.buffer[self.position:end] = data
+
+        self.position = end
+        return len(data)
+
+    def writelines(self, lines):
+        for data in lines:
+            self.write(data)
+
+
+class QueueWriter:
+    # Binary file-like writer for a thread rendering for an event loop:
+    # the data is cut in chunks of chunk_size bytes, put on an asyncio.Queue of the loop
+    # Once the reader is gone (closed), writes raise BrokenPipeError to stop the rendering
+    def __init__(self, loop, queue, chunk_size):
+        self.loop = loop
+        self.queue = queue
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.closed = False
+
+    def put(self, chunk):
+        if self.closed:
+            raise BrokenPipeError('The reader of the queue is gone')
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, chunk)
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.chunk_size:
+            self.put(bytes(self.buffer[:self.chunk_size]))
+            del self.buffer[:self.chunk_size]
+
+        return len(data)
+
+    def writelines(self, lines):
+        for data in lines:
+            self.write(data)
+
+    def flush(self):
+        # Put the last partial chunk
+        if self.buffer:
+            self.put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def close(self):
+        self.closed = True
+
+
 class QRCodeGenerator:
     # Constants
     NUMERIC_CHARSET = set('0123456789')
 
     ALPHANUMERIC_CHARSET = set('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:')
 
+    # Bits of every byte value, most significant bit first
+    BYTE_BITS = tuple(tuple(byte >> shift & 1 for shift in range(7, -1, -1)) for byte in range(256))
+
+    # Terminal glyphs of 4 modules of two rows, keyed by the hex digits of the top and bottom row nibbles:
+    # every character is a pair of stacked modules (dark = 1), empty, lower half, upper half or full block
+    HALF_BLOCK_GLYPHS = {
+        f'{top:x}{bottom:x}': ''.join(' ▄▀█'[(top >> shift & 1) * 2 + (bottom >> shift & 1)] for shift in range(3, -1, -1))
+        for top in range(16) for bottom in range(16)
+    }
+
+    # Runs of characters by the narrowest encoding mode able to encode them
+    # Used for ASCII data, other data is split by the pattern that also detects kanji runs
+    CHARACTER_RUN_PATTERN = re.compile(r'(?P<numeric>[0-9]+)|(?P<alphanumeric>[A-Z $%*+\-./:]+)|(?P<byte>[^0-9A-Z $%*+\-./:]+)')
+
+    # Encoding modes able to encode each character class
+    CHARACTER_CLASS_ENCODING_MODES = {
+        'numeric': ('numeric', 'alphanumeric', 'byte'),
+        'alphanumeric': ('alphanumeric', 'byte'),
+        'kanji': ('kanji', 'byte'),
+        'byte': ('byte',),
+    }
+
+    # Cost of one character (one UTF-8 byte in byte mode) in 1/6 bits
+    CHARACTER_COSTS = {
+        'numeric': 20,
+        'alphanumeric': 33,
+        'kanji': 78,
+        'byte': 48,
+    }
+
+    # Ranges of versions sharing the same character count indicator lengths
+    CHARACTER_COUNT_INDICATOR_VERSION_RANGES = ((1, 9), (10, 26), (27, 40))
+
     # Code info for each encoding mode
     ENCODING_MODE_INDICATOR = {
-        'numeric': '0001',
-        'alphanumeric': '0010',
-        'byte': '0100',
+        'numeric': 0b0001,
+        'alphanumeric': 0b0010,
+        'byte': 0b0100,
+        'kanji': 0b1000,
     }
 
     # Data capacity for all possible QR Codes
-    # L | numeric, alphanumeric, byte, max_bits -> data capacity
-    # M | numeric, alphanumeric, byte, max_bits -> data capacity
-    # Q | numeric, alphanumeric, byte, max_bits -> data capacity
-    # H | numeric, alphanumeric, byte, max_bits -> data capacity
+    # L | numeric, alphanumeric, byte, kanji, max_bits -> data capacity
+    # M | numeric, alphanumeric, byte, kanji, max_bits -> data capacity
+    # Q | numeric, alphanumeric, byte, kanji, max_bits -> data capacity
+    # H | numeric, alphanumeric, byte, kanji, max_bits -> data capacity
     CAPACITIES_TABLE = {
         1: {
-            'L': {'numeric': 41, 'alphanumeric': 25, 'byte': 17, 'max_bits': 152},
-            'M': {'numeric': 34, 'alphanumeric': 20, 'byte': 14, 'max_bits': 128},
-            'Q': {'numeric': 27, 'alphanumeric': 16, 'byte': 11, 'max_bits': 104},
-            'H': {'numeric': 17, 'alphanumeric': 10, 'byte': 7, 'max_bits': 72},
+            'L': {'numeric': 41, 'alphanumeric': 25, 'byte': 17, 'kanji': 10, 'max_bits': 152},
+            'M': {'numeric': 34, 'alphanumeric': 20, 'byte': 14, 'kanji': 8, 'max_bits': 128},
+            'Q': {'numeric': 27, 'alphanumeric': 16, 'byte': 11, 'kanji': 7, 'max_bits': 104},
+            'H': {'numeric': 17, 'alphanumeric': 10, 'byte': 7, 'kanji': 4, 'max_bits': 72},
         },
         2: {
-            'L': {'numeric': 77, 'alphanumeric': 47, 'byte': 32, 'max_bits': 272},
-            'M': {'numeric': 63, 'alphanumeric': 38, 'byte': 26, 'max_bits': 224},
-            'Q': {'numeric': 48, 'alphanumeric': 29, 'byte': 20, 'max_bits': 176},
-            'H': {'numeric': 34, 'alphanumeric': 20, 'byte': 14, 'max_bits': 128},
+            'L': {'numeric': 77, 'alphanumeric': 47, 'byte': 32, 'kanji': 20, 'max_bits': 272},
+            'M': {'numeric': 63, 'alphanumeric': 38, 'byte': 26, 'kanji': 16, 'max_bits': 224},
+            'Q': {'numeric': 48, 'alphanumeric': 29, 'byte': 20, 'kanji': 12, 'max_bits': 176},
+            'H': {'numeric': 34, 'alphanumeric': 20, 'byte': 14, 'kanji': 8, 'max_bits': 128},
         },
         3: {
-            'L': {'numeric': 127, 'alphanumeric': 77, 'byte': 53, 'max_bits': 440},
-            'M': {'numeric': 101, 'alphanumeric': 61, 'byte': 42, 'max_bits': 352},
-            'Q': {'numeric': 77, 'alphanumeric': 47, 'byte': 32, 'max_bits': 272},
-            'H': {'numeric': 58, 'alphanumeric': 35, 'byte': 24, 'max_bits': 208},
+            'L': {'numeric': 127, 'alphanumeric': 77, 'byte': 53, 'kanji': 32, 'max_bits': 440},
+            'M': {'numeric': 101, 'alphanumeric': 61, 'byte': 42, 'kanji': 26, 'max_bits': 352},
+            'Q': {'numeric': 77, 'alphanumeric': 47, 'byte': 32, 'kanji': 20, 'max_bits': 272},
+            'H': {'numeric': 58, 'alphanumeric': 35, 'byte': 24, 'kanji': 15, 'max_bits': 208},
         },
         4: {
-            'L': {'numeric': 187, 'alphanumeric': 114, 'byte': 78, 'max_bits': 640},
-            'M': {'numeric': 149, 'alphanumeric': 90, 'byte': 62, 'max_bits': 512},
-            'Q': {'numeric': 111, 'alphanumeric': 67, 'byte': 46, 'max_bits': 384},
-            'H': {'numeric': 82, 'alphanumeric': 50, 'byte': 34, 'max_bits': 288},
+            'L': {'numeric': 187, 'alphanumeric': 114, 'byte': 78, 'kanji': 48, 'max_bits': 640},
+            'M': {'numeric': 149, 'alphanumeric': 90, 'byte': 62, 'kanji': 38, 'max_bits': 512},
+            'Q': {'numeric': 111, 'alphanumeric': 67, 'byte': 46, 'kanji': 28, 'max_bits': 384},
+            'H': {'numeric': 82, 'alphanumeric': 50, 'byte': 34, 'kanji': 21, 'max_bits': 288},
         },
         5: {
-            'L': {'numeric': 255, 'alphanumeric': 154, 'byte': 106, 'max_bits': 864},
-            'M': {'numeric': 202, 'alphanumeric': 122, 'byte': 84, 'max_bits': 688},
-            'Q': {'numeric': 144, 'alphanumeric': 87, 'byte': 60, 'max_bits': 496},
-            'H': {'numeric': 106, 'alphanumeric': 64, 'byte': 44, 'max_bits': 368},
+            'L': {'numeric': 255, 'alphanumeric': 154, 'byte': 106, 'kanji': 65, 'max_bits': 864},
+            'M': {'numeric': 202, 'alphanumeric': 122, 'byte': 84, 'kanji': 52, 'max_bits': 688},
+            'Q': {'numeric': 144, 'alphanumeric': 87, 'byte': 60, 'kanji': 37, 'max_bits': 496},
+            'H': {'numeric': 106, 'alphanumeric': 64, 'byte': 44, 'kanji': 27, 'max_bits': 368},
         },
         6: {
-            'L': {'numeric': 322, 'alphanumeric': 195, 'byte': 134, 'max_bits': 1088},
-            'M': {'numeric': 255, 'alphanumeric': 154, 'byte': 106, 'max_bits': 864},
-            'Q': {'numeric': 178, 'alphanumeric': 108, 'byte': 74, 'max_bits': 608},
-            'H': {'numeric': 139, 'alphanumeric': 84, 'byte': 58, 'max_bits': 480},
+            'L': {'numeric': 322, 'alphanumeric': 195, 'byte': 134, 'kanji': 82, 'max_bits': 1088},
+            'M': {'numeric': 255, 'alphanumeric': 154, 'byte': 106, 'kanji': 65, 'max_bits': 864},
+            'Q': {'numeric': 178, 'alphanumeric': 108, 'byte': 74, 'kanji': 45, 'max_bits': 608},
+            'H': {'numeric': 139, 'alphanumeric': 84, 'byte': 58, 'kanji': 36, 'max_bits': 480},
         },
         7: {
-            'L': {'numeric': 370, 'alphanumeric': 224, 'byte': 154, 'max_bits': 1248},
-            'M': {'numeric': 293, 'alphanumeric': 178, 'byte': 122, 'max_bits': 992},
-            'Q': {'numeric': 207, 'alphanumeric': 125, 'byte': 86, 'max_bits': 704},
-            'H': {'numeric': 154, 'alphanumeric': 93, 'byte': 64, 'max_bits': 528},
+            'L': {'numeric': 370, 'alphanumeric': 224, 'byte': 154, 'kanji': 95, 'max_bits': 1248},
+            'M': {'numeric': 293, 'alphanumeric': 178, 'byte': 122, 'kanji': 75, 'max_bits': 992},
+            'Q': {'numeric': 207, 'alphanumeric': 125, 'byte': 86, 'kanji': 53, 'max_bits': 704},
+            'H': {'numeric': 154, 'alphanumeric': 93, 'byte': 64, 'kanji': 39, 'max_bits': 528},
         },
         8: {
-            'L': {'numeric': 461, 'alphanumeric': 279, 'byte': 192, 'max_bits': 1552},
-            'M': {'numeric': 365, 'alphanumeric': 221, 'byte': 152, 'max_bits': 1232},
-            'Q': {'numeric': 259, 'alphanumeric': 157, 'byte': 108, 'max_bits': 880},
-            'H': {'numeric': 202, 'alphanumeric': 122, 'byte': 84, 'max_bits': 688},
+            'L': {'numeric': 461, 'alphanumeric': 279, 'byte': 192, 'kanji': 118, 'max_bits': 1552},
+            'M': {'numeric': 365, 'alphanumeric': 221, 'byte': 152, 'kanji': 93, 'max_bits': 1232},
+            'Q': {'numeric': 259, 'alphanumeric': 157, 'byte': 108, 'kanji': 66, 'max_bits': 880},
+            'H': {'numeric': 202, 'alphanumeric': 122, 'byte': 84, 'kanji': 52, 'max_bits': 688},
         },
         9: {
-            'L': {'numeric': 552, 'alphanumeric': 335, 'byte': 230, 'max_bits': 1856},
-            'M': {'numeric': 432, 'alphanumeric': 262, 'byte': 180, 'max_bits': 1456},
-            'Q': {'numeric': 312, 'alphanumeric': 189, 'byte': 130, 'max_bits': 1056},
-            'H': {'numeric': 235, 'alphanumeric': 143, 'byte': 98, 'max_bits': 800},
+            'L': {'numeric': 552, 'alphanumeric': 335, 'byte': 230, 'kanji': 141, 'max_bits': 1856},
+            'M': {'numeric': 432, 'alphanumeric': 262, 'byte': 180, 'kanji': 111, 'max_bits': 1456},
+            'Q': {'numeric': 312, 'alphanumeric': 189, 'byte': 130, 'kanji': 80, 'max_bits': 1056},
+            'H': {'numeric': 235, 'alphanumeric': 143, 'byte': 98, 'kanji': 60, 'max_bits': 800},
         },
         10: {
-            'L': {'numeric': 652, 'alphanumeric': 395, 'byte': 271, 'max_bits': 2192},
-            'M': {'numeric': 513, 'alphanumeric': 311, 'byte': 213, 'max_bits': 1728},
-            'Q': {'numeric': 364, 'alphanumeric': 221, 'byte': 151, 'max_bits': 1232},
-            'H': {'numeric': 288, 'alphanumeric': 174, 'byte': 119, 'max_bits': 976},
+            'L': {'numeric': 652, 'alphanumeric': 395, 'byte': 271, 'kanji': 167, 'max_bits': 2192},
+            'M': {'numeric': 513, 'alphanumeric': 311, 'byte': 213, 'kanji': 131, 'max_bits': 1728},
+            'Q': {'numeric': 364, 'alphanumeric': 221, 'byte': 151, 'kanji': 93, 'max_bits': 1232},
+            'H': {'numeric': 288, 'alphanumeric': 174, 'byte': 119, 'kanji': 74, 'max_bits': 976},
         },
         11: {
-            'L': {'numeric': 772, 'alphanumeric': 468, 'byte': 321, 'max_bits': 2592},
-            'M': {'numeric': 604, 'alphanumeric': 366, 'byte': 251, 'max_bits': 2032},
-            'Q': {'numeric': 427, 'alphanumeric': 259, 'byte': 177, 'max_bits': 1440},
-            'H': {'numeric': 331, 'alphanumeric': 200, 'byte': 137, 'max_bits': 1120},
+            'L': {'numeric': 772, 'alphanumeric': 468, 'byte': 321, 'kanji': 198, 'max_bits': 2592},
+            'M': {'numeric': 604, 'alphanumeric': 366, 'byte': 251, 'kanji': 155, 'max_bits': 2032},
+            'Q': {'numeric': 427, 'alphanumeric': 259, 'byte': 177, 'kanji': 109, 'max_bits': 1440},
+            'H': {'numeric': 331, 'alphanumeric': 200, 'byte': 137, 'kanji': 85, 'max_bits': 1120},
         },
         12: {
-            'L': {'numeric': 883, 'alphanumeric': 535, 'byte': 367, 'max_bits': 2960},
-            'M': {'numeric': 691, 'alphanumeric': 419, 'byte': 287, 'max_bits': 2320},
-            'Q': {'numeric': 489, 'alphanumeric': 296, 'byte': 203, 'max_bits': 1648},
-            'H': {'numeric': 374, 'alphanumeric': 227, 'byte': 155, 'max_bits': 1264},
+            'L': {'numeric': 883, 'alphanumeric': 535, 'byte': 367, 'kanji': 226, 'max_bits': 2960},
+            'M': {'numeric': 691, 'alphanumeric': 419, 'byte': 287, 'kanji': 177, 'max_bits': 2320},
+            'Q': {'numeric': 489, 'alphanumeric': 296, 'byte': 203, 'kanji': 125, 'max_bits': 1648},
+            'H': {'numeric': 374, 'alphanumeric': 227, 'byte': 155, 'kanji': 96, 'max_bits': 1264},
         },
         13: {
-            'L': {'numeric': 1022, 'alphanumeric': 619, 'byte': 425, 'max_bits': 3424},
-            'M': {'numeric': 796, 'alphanumeric': 483, 'byte': 331, 'max_bits': 2672},
-            'Q': {'numeric': 580, 'alphanumeric': 352, 'byte': 241, 'max_bits': 1952},
-            'H': {'numeric': 427, 'alphanumeric': 259, 'byte': 177, 'max_bits': 1440},
+            'L': {'numeric': 1022, 'alphanumeric': 619, 'byte': 425, 'kanji': 262, 'max_bits': 3424},
+            'M': {'numeric': 796, 'alphanumeric': 483, 'byte': 331, 'kanji': 204, 'max_bits': 2672},
+            'Q': {'numeric': 580, 'alphanumeric': 352, 'byte': 241, 'kanji': 149, 'max_bits': 1952},
+            'H': {'numeric': 427, 'alphanumeric': 259, 'byte': 177, 'kanji': 109, 'max_bits': 1440},
         },
         14: {
-            'L': {'numeric': 1101, 'alphanumeric': 667, 'byte': 458, 'max_bits': 3688},
-            'M': {'numeric': 871, 'alphanumeric': 528, 'byte': 362, 'max_bits': 2920},
-            'Q': {'numeric': 621, 'alphanumeric': 376, 'byte': 258, 'max_bits': 2088},
-            'H': {'numeric': 468, 'alphanumeric': 283, 'byte': 194, 'max_bits': 1576},
+            'L': {'numeric': 1101, 'alphanumeric': 667, 'byte': 458, 'kanji': 282, 'max_bits': 3688},
+            'M': {'numeric': 871, 'alphanumeric': 528, 'byte': 362, 'kanji': 223, 'max_bits': 2920},
+            'Q': {'numeric': 621, 'alphanumeric': 376, 'byte': 258, 'kanji': 159, 'max_bits': 2088},
+            'H': {'numeric': 468, 'alphanumeric': 283, 'byte': 194, 'kanji': 120, 'max_bits': 1576},
         },
         15: {
-            'L': {'numeric': 1250, 'alphanumeric': 758, 'byte': 520, 'max_bits': 4184},
-            'M': {'numeric': 991, 'alphanumeric': 600, 'byte': 412, 'max_bits': 3320},
-            'Q': {'numeric': 703, 'alphanumeric': 426, 'byte': 292, 'max_bits': 2360},
-            'H': {'numeric': 530, 'alphanumeric': 321, 'byte': 220, 'max_bits': 1784},
+            'L': {'numeric': 1250, 'alphanumeric': 758, 'byte': 520, 'kanji': 320, 'max_bits': 4184},
+            'M': {'numeric': 991, 'alphanumeric': 600, 'byte': 412, 'kanji': 254, 'max_bits': 3320},
+            'Q': {'numeric': 703, 'alphanumeric': 426, 'byte': 292, 'kanji': 180, 'max_bits': 2360},
+            'H': {'numeric': 530, 'alphanumeric': 321, 'byte': 220, 'kanji': 136, 'max_bits': 1784},
         },
         16: {
-            'L': {'numeric': 1408, 'alphanumeric': 854, 'byte': 586, 'max_bits': 4712},
-            'M': {'numeric': 1082, 'alphanumeric': 656, 'byte': 450, 'max_bits': 3624},
-            'Q': {'numeric': 775, 'alphanumeric': 470, 'byte': 322, 'max_bits': 2600},
-            'H': {'numeric': 602, 'alphanumeric': 365, 'byte': 250, 'max_bits': 2024},
+            'L': {'numeric': 1408, 'alphanumeric': 854, 'byte': 586, 'kanji': 361, 'max_bits': 4712},
+            'M': {'numeric': 1082, 'alphanumeric': 656, 'byte': 450, 'kanji': 277, 'max_bits': 3624},
+            'Q': {'numeric': 775, 'alphanumeric': 470, 'byte': 322, 'kanji': 198, 'max_bits': 2600},
+            'H': {'numeric': 602, 'alphanumeric': 365, 'byte': 250, 'kanji': 154, 'max_bits': 2024},
         },
         17: {
-            'L': {'numeric': 1548, 'alphanumeric': 938, 'byte': 644, 'max_bits': 5176},
-            'M': {'numeric': 1212, 'alphanumeric': 734, 'byte': 504, 'max_bits': 4056},
-            'Q': {'numeric': 876, 'alphanumeric': 531, 'byte': 364, 'max_bits': 2936},
-            'H': {'numeric': 674, 'alphanumeric': 408, 'byte': 280, 'max_bits': 2264},
+            'L': {'numeric': 1548, 'alphanumeric': 938, 'byte': 644, 'kanji': 397, 'max_bits': 5176},
+            'M': {'numeric': 1212, 'alphanumeric': 734, 'byte': 504, 'kanji': 310, 'max_bits': 4056},
+            'Q': {'numeric': 876, 'alphanumeric': 531, 'byte': 364, 'kanji': 224, 'max_bits': 2936},
+            'H': {'numeric': 674, 'alphanumeric': 408, 'byte': 280, 'kanji': 173, 'max_bits': 2264},
         },
         18: {
-            'L': {'numeric': 1725, 'alphanumeric': 1046, 'byte': 718, 'max_bits': 5768},
-            'M': {'numeric': 1346, 'alphanumeric': 816, 'byte': 560, 'max_bits': 4504},
-            'Q': {'numeric': 948, 'alphanumeric': 574, 'byte': 394, 'max_bits': 3176},
-            'H': {'numeric': 746, 'alphanumeric': 452, 'byte': 310, 'max_bits': 2504},
+            'L': {'numeric': 1725, 'alphanumeric': 1046, 'byte': 718, 'kanji': 442, 'max_bits': 5768},
+            'M': {'numeric': 1346, 'alphanumeric': 816, 'byte': 560, 'kanji': 345, 'max_bits': 4504},
+            'Q': {'numeric': 948, 'alphanumeric': 574, 'byte': 394, 'kanji': 243, 'max_bits': 3176},
+            'H': {'numeric': 746, 'alphanumeric': 452, 'byte': 310, 'kanji': 191, 'max_bits': 2504},
         },
         19: {
-            'L': {'numeric': 1903, 'alphanumeric': 1153, 'byte': 792, 'max_bits': 6360},
-            'M': {'numeric': 1500, 'alphanumeric': 909, 'byte': 624, 'max_bits': 5016},
-            'Q': {'numeric': 1063, 'alphanumeric': 644, 'byte': 442, 'max_bits': 3560},
-            'H': {'numeric': 813, 'alphanumeric': 493, 'byte': 338, 'max_bits': 2728},
+            'L': {'numeric': 1903, 'alphanumeric': 1153, 'byte': 792, 'kanji': 488, 'max_bits': 6360},
+            'M': {'numeric': 1500, 'alphanumeric': 909, 'byte': 624, 'kanji': 384, 'max_bits': 5016},
+            'Q': {'numeric': 1063, 'alphanumeric': 644, 'byte': 442, 'kanji': 272, 'max_bits': 3560},
+            'H': {'numeric': 813, 'alphanumeric': 493, 'byte': 338, 'kanji': 208, 'max_bits': 2728},
         },
         20: {
-            'L': {'numeric': 2061, 'alphanumeric': 1249, 'byte': 858, 'max_bits': 6888},
-            'M': {'numeric': 1600, 'alphanumeric': 970, 'byte': 666, 'max_bits': 5352},
-            'Q': {'numeric': 1159, 'alphanumeric': 702, 'byte': 482, 'max_bits': 3880},
-            'H': {'numeric': 919, 'alphanumeric': 557, 'byte': 382, 'max_bits': 3080},
+            'L': {'numeric': 2061, 'alphanumeric': 1249, 'byte': 858, 'kanji': 528, 'max_bits': 6888},
+            'M': {'numeric': 1600, 'alphanumeric': 970, 'byte': 666, 'kanji': 410, 'max_bits': 5352},
+            'Q': {'numeric': 1159, 'alphanumeric': 702, 'byte': 482, 'kanji': 297, 'max_bits': 3880},
+            'H': {'numeric': 919, 'alphanumeric': 557, 'byte': 382, 'kanji': 235, 'max_bits': 3080},
         },
         21: {
-            'L': {'numeric': 2232, 'alphanumeric': 1352, 'byte': 929, 'max_bits': 7456},
-            'M': {'numeric': 1708, 'alphanumeric': 1035, 'byte': 711, 'max_bits': 5712},
-            'Q': {'numeric': 1224, 'alphanumeric': 742, 'byte': 509, 'max_bits': 4096},
-            'H': {'numeric': 969, 'alphanumeric': 587, 'byte': 403, 'max_bits': 3248},
+            'L': {'numeric': 2232, 'alphanumeric': 1352, 'byte': 929, 'kanji': 572, 'max_bits': 7456},
+            'M': {'numeric': 1708, 'alphanumeric': 1035, 'byte': 711, 'kanji': 438, 'max_bits': 5712},
+            'Q': {'numeric': 1224, 'alphanumeric': 742, 'byte': 509, 'kanji': 314, 'max_bits': 4096},
+            'H': {'numeric': 969, 'alphanumeric': 587, 'byte': 403, 'kanji': 248, 'max_bits': 3248},
         },
         22: {
-            'L': {'numeric': 2409, 'alphanumeric': 1460, 'byte': 1003, 'max_bits': 8048},
-            'M': {'numeric': 1872, 'alphanumeric': 1134, 'byte': 779, 'max_bits': 6256},
-            'Q': {'numeric': 1358, 'alphanumeric': 823, 'byte': 565, 'max_bits': 4544},
-            'H': {'numeric': 1056, 'alphanumeric': 640, 'byte': 439, 'max_bits': 3536},
+            'L': {'numeric': 2409, 'alphanumeric': 1460, 'byte': 1003, 'kanji': 618, 'max_bits': 8048},
+            'M': {'numeric': 1872, 'alphanumeric': 1134, 'byte': 779, 'kanji': 480, 'max_bits': 6256},
+            'Q': {'numeric': 1358, 'alphanumeric': 823, 'byte': 565, 'kanji': 348, 'max_bits': 4544},
+            'H': {'numeric': 1056, 'alphanumeric': 640, 'byte': 439, 'kanji': 270, 'max_bits': 3536},
         },
         23: {
-            'L': {'numeric': 2620, 'alphanumeric': 1588, 'byte': 1091, 'max_bits': 8752},
-            'M': {'numeric': 2059, 'alphanumeric': 1248, 'byte': 857, 'max_bits': 6880},
-            'Q': {'numeric': 1468, 'alphanumeric': 890, 'byte': 611, 'max_bits': 4912},
-            'H': {'numeric': 1108, 'alphanumeric': 672, 'byte': 461, 'max_bits': 3712},
+            'L': {'numeric': 2620, 'alphanumeric': 1588, 'byte': 1091, 'kanji': 672, 'max_bits': 8752},
+            'M': {'numeric': 2059, 'alphanumeric': 1248, 'byte': 857, 'kanji': 528, 'max_bits': 6880},
+            'Q': {'numeric': 1468, 'alphanumeric': 890, 'byte': 611, 'kanji': 376, 'max_bits': 4912},
+            'H': {'numeric': 1108, 'alphanumeric': 672, 'byte': 461, 'kanji': 284, 'max_bits': 3712},
         },
         24: {
-            'L': {'numeric': 2812, 'alphanumeric': 1704, 'byte': 1171, 'max_bits': 9392},
-            'M': {'numeric': 2188, 'alphanumeric': 1326, 'byte': 911, 'max_bits': 7312},
-            'Q': {'numeric': 1588, 'alphanumeric': 963, 'byte': 661, 'max_bits': 5312},
-            'H': {'numeric': 1228, 'alphanumeric': 744, 'byte': 511, 'max_bits': 4112},
+            'L': {'numeric': 2812, 'alphanumeric': 1704, 'byte': 1171, 'kanji': 721, 'max_bits': 9392},
+            'M': {'numeric': 2188, 'alphanumeric': 1326, 'byte': 911, 'kanji': 561, 'max_bits': 7312},
+            'Q': {'numeric': 1588, 'alphanumeric': 963, 'byte': 661, 'kanji': 407, 'max_bits': 5312},
+            'H': {'numeric': 1228, 'alphanumeric': 744, 'byte': 511, 'kanji': 315, 'max_bits': 4112},
         },
         25: {
-            'L': {'numeric': 3057, 'alphanumeric': 1853, 'byte': 1273, 'max_bits': 10208},
-            'M': {'numeric': 2395, 'alphanumeric': 1451, 'byte': 997, 'max_bits': 8000},
-            'Q': {'numeric': 1718, 'alphanumeric': 1041, 'byte': 715, 'max_bits': 5744},
-            'H': {'numeric': 1286, 'alphanumeric': 779, 'byte': 535, 'max_bits': 4304},
+            'L': {'numeric': 3057, 'alphanumeric': 1853, 'byte': 1273, 'kanji': 784, 'max_bits': 10208},
+            'M': {'numeric': 2395, 'alphanumeric': 1451, 'byte': 997, 'kanji': 614, 'max_bits': 8000},
+            'Q': {'numeric': 1718, 'alphanumeric': 1041, 'byte': 715, 'kanji': 440, 'max_bits': 5744},
+            'H': {'numeric': 1286, 'alphanumeric': 779, 'byte': 535, 'kanji': 330, 'max_bits': 4304},
         },
         26: {
-            'L': {'numeric': 3283, 'alphanumeric': 1990, 'byte': 1367, 'max_bits': 10960},
-            'M': {'numeric': 2544, 'alphanumeric': 1542, 'byte': 1059, 'max_bits': 8496},
-            'Q': {'numeric': 1804, 'alphanumeric': 1094, 'byte': 751, 'max_bits': 6032},
-            'H': {'numeric': 1425, 'alphanumeric': 864, 'byte': 593, 'max_bits': 4768},
+            'L': {'numeric': 3283, 'alphanumeric': 1990, 'byte': 1367, 'kanji': 842, 'max_bits': 10960},
+            'M': {'numeric': 2544, 'alphanumeric': 1542, 'byte': 1059, 'kanji': 652, 'max_bits': 8496},
+            'Q': {'numeric': 1804, 'alphanumeric': 1094, 'byte': 751, 'kanji': 462, 'max_bits': 6032},
+            'H': {'numeric': 1425, 'alphanumeric': 864, 'byte': 593, 'kanji': 365, 'max_bits': 4768},
         },
         27: {
-            'L': {'numeric': 3514, 'alphanumeric': 2132, 'byte': 1465, 'max_bits': 11744},
-            'M': {'numeric': 2701, 'alphanumeric': 1637, 'byte': 1125, 'max_bits': 9024},
-            'Q': {'numeric': 1933, 'alphanumeric': 1172, 'byte': 805, 'max_bits': 6464},
-            'H': {'numeric': 1501, 'alphanumeric': 910, 'byte': 625, 'max_bits': 5024},
+            'L': {'numeric': 3514, 'alphanumeric': 2132, 'byte': 1465, 'kanji': 902, 'max_bits': 11744},
+            'M': {'numeric': 2701, 'alphanumeric': 1637, 'byte': 1125, 'kanji': 692, 'max_bits': 9024},
+            'Q': {'numeric': 1933, 'alphanumeric': 1172, 'byte': 805, 'kanji': 496, 'max_bits': 6464},
+            'H': {'numeric': 1501, 'alphanumeric': 910, 'byte': 625, 'kanji': 385, 'max_bits': 5024},
         },
         28: {
-            'L': {'numeric': 3669, 'alphanumeric': 2223, 'byte': 1528, 'max_bits': 12248},
-            'M': {'numeric': 2857, 'alphanumeric': 1732, 'byte': 1190, 'max_bits': 9544},
-            'Q': {'numeric': 2085, 'alphanumeric': 1263, 'byte': 868, 'max_bits': 6968},
-            'H': {'numeric': 1581, 'alphanumeric': 958, 'byte': 658, 'max_bits': 5288},
+            'L': {'numeric': 3669, 'alphanumeric': 2223, 'byte': 1528, 'kanji': 940, 'max_bits': 12248},
+            'M': {'numeric': 2857, 'alphanumeric': 1732, 'byte': 1190, 'kanji': 732, 'max_bits': 9544},
+            'Q': {'numeric': 2085, 'alphanumeric': 1263, 'byte': 868, 'kanji': 534, 'max_bits': 6968},
+            'H': {'numeric': 1581, 'alphanumeric': 958, 'byte': 658, 'kanji': 405, 'max_bits': 5288},
         },
         29: {
-            'L': {'numeric': 3909, 'alphanumeric': 2369, 'byte': 1628, 'max_bits': 13048},
-            'M': {'numeric': 3035, 'alphanumeric': 1839, 'byte': 1264, 'max_bits': 10136},
-            'Q': {'numeric': 2181, 'alphanumeric': 1322, 'byte': 908, 'max_bits': 7288},
-            'H': {'numeric': 1677, 'alphanumeric': 1016, 'byte': 698, 'max_bits': 5608},
+            'L': {'numeric': 3909, 'alphanumeric': 2369, 'byte': 1628, 'kanji': 1002, 'max_bits': 13048},
+            'M': {'numeric': 3035, 'alphanumeric': 1839, 'byte': 1264, 'kanji': 778, 'max_bits': 10136},
+            'Q': {'numeric': 2181, 'alphanumeric': 1322, 'byte': 908, 'kanji': 559, 'max_bits': 7288},
+            'H': {'numeric': 1677, 'alphanumeric': 1016, 'byte': 698, 'kanji': 430, 'max_bits': 5608},
         },
         30: {
-            'L': {'numeric': 4158, 'alphanumeric': 2520, 'byte': 1732, 'max_bits': 13880},
-            'M': {'numeric': 3289, 'alphanumeric': 1994, 'byte': 1370, 'max_bits': 10984},
-            'Q': {'numeric': 2358, 'alphanumeric': 1429, 'byte': 982, 'max_bits': 7880},
-            'H': {'numeric': 1782, 'alphanumeric': 1080, 'byte': 742, 'max_bits': 5960},
+            'L': {'numeric': 4158, 'alphanumeric': 2520, 'byte': 1732, 'kanji': 1066, 'max_bits': 13880},
+            'M': {'numeric': 3289, 'alphanumeric': 1994, 'byte': 1370, 'kanji': 843, 'max_bits': 10984},
+            'Q': {'numeric': 2358, 'alphanumeric': 1429, 'byte': 982, 'kanji': 604, 'max_bits': 7880},
+            'H': {'numeric': 1782, 'alphanumeric': 1080, 'byte': 742, 'kanji': 457, 'max_bits': 5960},
         },
         31: {
-            'L': {'numeric': 4417, 'alphanumeric': 2677, 'byte': 1840, 'max_bits': 14744},
-            'M': {'numeric': 3486, 'alphanumeric': 2113, 'byte': 1452, 'max_bits': 11640},
-            'Q': {'numeric': 2473, 'alphanumeric': 1499, 'byte': 1030, 'max_bits': 8264},
-            'H': {'numeric': 1897, 'alphanumeric': 1150, 'byte': 790, 'max_bits': 6344},
+            'L': {'numeric': 4417, 'alphanumeric': 2677, 'byte': 1840, 'kanji': 1132, 'max_bits': 14744},
+            'M': {'numeric': 3486, 'alphanumeric': 2113, 'byte': 1452, 'kanji': 894, 'max_bits': 11640},
+            'Q': {'numeric': 2473, 'alphanumeric': 1499, 'byte': 1030, 'kanji': 634, 'max_bits': 8264},
+            'H': {'numeric': 1897, 'alphanumeric': 1150, 'byte': 790, 'kanji': 486, 'max_bits': 6344},
         },
         32: {
-            'L': {'numeric': 4686, 'alphanumeric': 2840, 'byte': 1952, 'max_bits': 15640},
-            'M': {'numeric': 3693, 'alphanumeric': 2238, 'byte': 1538, 'max_bits': 12328},
-            'Q': {'numeric': 2670, 'alphanumeric': 1618, 'byte': 1112, 'max_bits': 8920},
-            'H': {'numeric': 2022, 'alphanumeric': 1226, 'byte': 842, 'max_bits': 6760},
+            'L': {'numeric': 4686, 'alphanumeric': 2840, 'byte': 1952, 'kanji': 1201, 'max_bits': 15640},
+            'M': {'numeric': 3693, 'alphanumeric': 2238, 'byte': 1538, 'kanji': 947, 'max_bits': 12328},
+            'Q': {'numeric': 2670, 'alphanumeric': 1618, 'byte': 1112, 'kanji': 684, 'max_bits': 8920},
+            'H': {'numeric': 2022, 'alphanumeric': 1226, 'byte': 842, 'kanji': 518, 'max_bits': 6760},
         },
         33: {
-            'L': {'numeric': 4965, 'alphanumeric': 3009, 'byte': 2068, 'max_bits': 16568},
-            'M': {'numeric': 3909, 'alphanumeric': 2369, 'byte': 1628, 'max_bits': 13048},
-            'Q': {'numeric': 2805, 'alphanumeric': 1700, 'byte': 1168, 'max_bits': 9368},
-            'H': {'numeric': 2157, 'alphanumeric': 1307, 'byte': 898, 'max_bits': 7208},
+            'L': {'numeric': 4965, 'alphanumeric': 3009, 'byte': 2068, 'kanji': 1273, 'max_bits': 16568},
+            'M': {'numeric': 3909, 'alphanumeric': 2369, 'byte': 1628, 'kanji': 1002, 'max_bits': 13048},
+            'Q': {'numeric': 2805, 'alphanumeric': 1700, 'byte': 1168, 'kanji': 719, 'max_bits': 9368},
+            'H': {'numeric': 2157, 'alphanumeric': 1307, 'byte': 898, 'kanji': 553, 'max_bits': 7208},
         },
         34: {
-            'L': {'numeric': 5253, 'alphanumeric': 3183, 'byte': 2188, 'max_bits': 17528},
-            'M': {'numeric': 4134, 'alphanumeric': 2506, 'byte': 1722, 'max_bits': 13800},
-            'Q': {'numeric': 2949, 'alphanumeric': 1787, 'byte': 1228, 'max_bits': 9848},
-            'H': {'numeric': 2301, 'alphanumeric': 1394, 'byte': 958, 'max_bits': 7688},
+            'L': {'numeric': 5253, 'alphanumeric': 3183, 'byte': 2188, 'kanji': 1347, 'max_bits': 17528},
+            'M': {'numeric': 4134, 'alphanumeric': 2506, 'byte': 1722, 'kanji': 1060, 'max_bits': 13800},
+            'Q': {'numeric': 2949, 'alphanumeric': 1787, 'byte': 1228, 'kanji': 756, 'max_bits': 9848},
+            'H': {'numeric': 2301, 'alphanumeric': 1394, 'byte': 958, 'kanji': 590, 'max_bits': 7688},
         },
         35: {
-            'L': {'numeric': 5529, 'alphanumeric': 3351, 'byte': 2303, 'max_bits': 18448},
-            'M': {'numeric': 4343, 'alphanumeric': 2632, 'byte': 1809, 'max_bits': 14496},
-            'Q': {'numeric': 3081, 'alphanumeric': 1867, 'byte': 1283, 'max_bits': 10288},
-            'H': {'numeric': 2361, 'alphanumeric': 1431, 'byte': 983, 'max_bits': 7888},
+            'L': {'numeric': 5529, 'alphanumeric': 3351, 'byte': 2303, 'kanji': 1417, 'max_bits': 18448},
+            'M': {'numeric': 4343, 'alphanumeric': 2632, 'byte': 1809, 'kanji': 1113, 'max_bits': 14496},
+            'Q': {'numeric': 3081, 'alphanumeric': 1867, 'byte': 1283, 'kanji': 790, 'max_bits': 10288},
+            'H': {'numeric': 2361, 'alphanumeric': 1431, 'byte': 983, 'kanji': 605, 'max_bits': 7888},
         },
         36: {
-            'L': {'numeric': 5836, 'alphanumeric': 3537, 'byte': 2431, 'max_bits': 19472},
-            'M': {'numeric': 4588, 'alphanumeric': 2780, 'byte': 1911, 'max_bits': 15312},
-            'Q': {'numeric': 3244, 'alphanumeric': 1966, 'byte': 1351, 'max_bits': 10832},
-            'H': {'numeric': 2524, 'alphanumeric': 1530, 'byte': 1051, 'max_bits': 8432},
+            'L': {'numeric': 5836, 'alphanumeric': 3537, 'byte': 2431, 'kanji': 1496, 'max_bits': 19472},
+            'M': {'numeric': 4588, 'alphanumeric': 2780, 'byte': 1911, 'kanji': 1176, 'max_bits': 15312},
+            'Q': {'numeric': 3244, 'alphanumeric': 1966, 'byte': 1351, 'kanji': 832, 'max_bits': 10832},
+            'H': {'numeric': 2524, 'alphanumeric': 1530, 'byte': 1051, 'kanji': 647, 'max_bits': 8432},
         },
         37: {
-            'L': {'numeric': 6153, 'alphanumeric': 3729, 'byte': 2563, 'max_bits': 20528},
-            'M': {'numeric': 4775, 'alphanumeric': 2894, 'byte': 1989, 'max_bits': 15936},
-            'Q': {'numeric': 3417, 'alphanumeric': 2071, 'byte': 1423, 'max_bits': 11408},
-            'H': {'numeric': 2625, 'alphanumeric': 1591, 'byte': 1093, 'max_bits': 8768},
+            'L': {'numeric': 6153, 'alphanumeric': 3729, 'byte': 2563, 'kanji': 1577, 'max_bits': 20528},
+            'M': {'numeric': 4775, 'alphanumeric': 2894, 'byte': 1989, 'kanji': 1224, 'max_bits': 15936},
+            'Q': {'numeric': 3417, 'alphanumeric': 2071, 'byte': 1423, 'kanji': 876, 'max_bits': 11408},
+            'H': {'numeric': 2625, 'alphanumeric': 1591, 'byte': 1093, 'kanji': 673, 'max_bits': 8768},
         },
         38: {
-            'L': {'numeric': 6479, 'alphanumeric': 3927, 'byte': 2699, 'max_bits': 21616},
-            'M': {'numeric': 5039, 'alphanumeric': 3054, 'byte': 2099, 'max_bits': 16816},
-            'Q': {'numeric': 3599, 'alphanumeric': 2181, 'byte': 1499, 'max_bits': 12016},
-            'H': {'numeric': 2735, 'alphanumeric': 1658, 'byte': 1139, 'max_bits': 9136},
+            'L': {'numeric': 6479, 'alphanumeric': 3927, 'byte': 2699, 'kanji': 1661, 'max_bits': 21616},
+            'M': {'numeric': 5039, 'alphanumeric': 3054, 'byte': 2099, 'kanji': 1292, 'max_bits': 16816},
+            'Q': {'numeric': 3599, 'alphanumeric': 2181, 'byte': 1499, 'kanji': 923, 'max_bits': 12016},
+            'H': {'numeric': 2735, 'alphanumeric': 1658, 'byte': 1139, 'kanji': 701, 'max_bits': 9136},
         },
         39: {
-            'L': {'numeric': 6743, 'alphanumeric': 4087, 'byte': 2809, 'max_bits': 22496},
-            'M': {'numeric': 5313, 'alphanumeric': 3220, 'byte': 2213, 'max_bits': 17728},
-            'Q': {'numeric': 3791, 'alphanumeric': 2298, 'byte': 1579, 'max_bits': 12656},
-            'H': {'numeric': 2927, 'alphanumeric': 1774, 'byte': 1219, 'max_bits': 9776},
+            'L': {'numeric': 6743, 'alphanumeric': 4087, 'byte': 2809, 'kanji': 1729, 'max_bits': 22496},
+            'M': {'numeric': 5313, 'alphanumeric': 3220, 'byte': 2213, 'kanji': 1362, 'max_bits': 17728},
+            'Q': {'numeric': 3791, 'alphanumeric': 2298, 'byte': 1579, 'kanji': 972, 'max_bits': 12656},
+            'H': {'numeric': 2927, 'alphanumeric': 1774, 'byte': 1219, 'kanji': 750, 'max_bits': 9776},
         },
         40: {
-            'L': {'numeric': 7089, 'alphanumeric': 4296, 'byte': 2953, 'max_bits': 23648},
-            'M': {'numeric': 5596, 'alphanumeric': 3391, 'byte': 2331, 'max_bits': 18672},
-            'Q': {'numeric': 3993, 'alphanumeric': 2420, 'byte': 1663, 'max_bits': 13328},
-            'H': {'numeric': 3057, 'alphanumeric': 1852, 'byte': 1273, 'max_bits': 10208},
+            'L': {'numeric': 7089, 'alphanumeric': 4296, 'byte': 2953, 'kanji': 1817, 'max_bits': 23648},
+            'M': {'numeric': 5596, 'alphanumeric': 3391, 'byte': 2331, 'kanji': 1435, 'max_bits': 18672},
+            'Q': {'numeric': 3993, 'alphanumeric': 2420, 'byte': 1663, 'kanji': 1024, 'max_bits': 13328},
+            'H': {'numeric': 3057, 'alphanumeric': 1852, 'byte': 1273, 'kanji': 784, 'max_bits': 10208},
         },
     }
 
@@ -1284,6 +1564,26 @@ class QRCodeGenerator:
         175
     ]
 
+    # Error correction level bits of the format information
+    ERROR_CORRECTION_LEVEL_BITS = {
+        'L': 0b01,
+        'M': 0b00,
+        'Q': 0b11,
+        'H': 0b10,
+    }
+
+    # Data mask patterns: module at column x and row y is switched if the condition is true
+    MASK_PATTERNS = (
+        lambda x, y: (x + y) % 2 == 0,
+        lambda x, y: y % 2 == 0,
+        lambda x, y: x % 3 == 0,
+        lambda x, y: (x + y) % 3 == 0,
+        lambda x, y: (y // 2 + x // 3) % 2 == 0,
+        lambda x, y: (x * y) % 2 + (x * y) % 3 == 0,
+        lambda x, y: ((x * y) % 2 + (x * y) % 3) % 2 == 0,
+        lambda x, y: ((x + y) % 2 + (x * y) % 3) % 2 == 0,
+    )
+
     # Table of all of the generator polynomials
     # Indexed by the number of ECC Code Words
     GENERATOR_POLYNOMIALS = {
@@ -1302,223 +1602,599 @@ class QRCodeGenerator:
         30: [1, 212, 246, 77, 73, 195, 192, 75, 98, 5, 70, 103, 177, 22, 217, 138, 51, 181, 246, 72, 25, 18, 46, 228, 74, 216, 195, 11, 106, 130, 150]
     }
 
-    def __init__(self, data, error_correction='H'):
+    # Row/column coordinates of the alignment pattern centers for each version
+    ALIGNMENT_PATTERN_POSITIONS = {
+        1: [],
+        2: [6, 18],
+        3: [6, 22],
+        4: [6, 26],
+        5: [6, 30],
+        6: [6, 34],
+        7: [6, 22, 38],
+        8: [6, 24, 42],
+        9: [6, 26, 46],
+        10: [6, 28, 50],
+        11: [6, 30, 54],
+        12: [6, 32, 58],
+        13: [6, 34, 62],
+        14: [6, 26, 46, 66],
+        15: [6, 26, 48, 70],
+        16: [6, 26, 50, 74],
+        17: [6, 30, 54, 78],
+        18: [6, 30, 56, 82],
+        19: [6, 30, 58, 86],
+        20: [6, 34, 62, 90],
+        21: [6, 28, 50, 72, 94],
+        22: [6, 26, 50, 74, 98],
+        23: [6, 30, 54, 78, 102],
+        24: [6, 28, 54, 80, 106],
+        25: [6, 32, 58, 84, 110],
+        26: [6, 30, 58, 86, 114],
+        27: [6, 34, 62, 90, 118],
+        28: [6, 26, 50, 74, 98, 122],
+        29: [6, 30, 54, 78, 102, 126],
+        30: [6, 26, 52, 78, 104, 130],
+        31: [6, 30, 56, 82, 108, 134],
+        32: [6, 34, 60, 86, 112, 138],
+        33: [6, 30, 58, 86, 114, 142],
+        34: [6, 34, 62, 90, 118, 146],
+        35: [6, 30, 54, 78, 102, 126, 150],
+        36: [6, 24, 50, 76, 102, 128, 154],
+        37: [6, 28, 54, 80, 106, 132, 158],
+        38: [6, 32, 58, 84, 110, 136, 162],
+        39: [6, 26, 54, 82, 110, 138, 166],
+        40: [6, 30, 58, 86, 114, 142, 170],
+    }
+
+    # 15 bits format information by error correction level and mask pattern:
+    # 2 bits error correction level and 3 bits mask pattern, 10 BCH (15, 5) error correction bits
+    # (generator polynomial 10100110111), XORed with 101010000010010
+    FORMAT_INFORMATION = {
+        'L': (0b111011111000100, 0b111001011110011, 0b111110110101010, 0b111100010011101,
+              0b110011000101111, 0b110001100011000, 0b110110001000001, 0b110100101110110),
+        'M': (0b101010000010010, 0b101000100100101, 0b101111001111100, 0b101101101001011,
+              0b100010111111001, 0b100000011001110, 0b100111110010111, 0b100101010100000),
+        'Q': (0b011010101011111, 0b011000001101000, 0b011111100110001, 0b011101000000110,
+              0b010010010110100, 0b010000110000011, 0b010111011011010, 0b010101111101101),
+        'H': (0b001011010001001, 0b001001110111110, 0b001110011100111, 0b001100111010000,
+              0b000011101100010, 0b000001001010101, 0b000110100001100, 0b000100000111011),
+    }
+
+    # 18 bits version information of versions 7 and above:
+    # 6 bits version number, 12 BCH (18, 6) error correction bits (generator polynomial 1111100100101)
+    VERSION_INFORMATION = {
+        7: 0b000111110010010100,
+        8: 0b001000010110111100,
+        9: 0b001001101010011001,
+        10: 0b001010010011010011,
+        11: 0b001011101111110110,
+        12: 0b001100011101100010,
+        13: 0b001101100001000111,
+        14: 0b001110011000001101,
+        15: 0b001111100100101000,
+        16: 0b010000101101111000,
+        17: 0b010001010001011101,
+        18: 0b010010101000010111,
+        19: 0b010011010100110010,
+        20: 0b010100100110100110,
+        21: 0b010101011010000011,
+        22: 0b010110100011001001,
+        23: 0b010111011111101100,
+        24: 0b011000111011000100,
+        25: 0b011001000111100001,
+        26: 0b011010111110101011,
+        27: 0b011011000010001110,
+        28: 0b011100110000011010,
+        29: 0b011101001100111111,
+        30: 0b011110110101110101,
+        31: 0b011111001001010000,
+        32: 0b100000100111010101,
+        33: 0b100001011011110000,
+        34: 0b100010100010111010,
+        35: 0b100011011110011111,
+        36: 0b100100101100001011,
+        37: 0b100101010000101110,
+        38: 0b100110101001100100,
+        39: 0b100111010101000001,
+        40: 0b101000110001101001,
+    }
+
+    # Module coordinates (x, y) of the format information bits, from the least significant bit,
+    # in the two copies: around the top-left finder pattern, and split next to the bottom-left and top-right
+    # finder patterns. Negative coordinates count from the right or bottom edge of the matrix
+    FORMAT_INFORMATION_POSITIONS = (
+        (
+            (8, 0), (8, 1), (8, 2), (8, 3), (8, 4), (8, 5),
+            (8, 7), (8, 8), (7, 8), (5, 8), (4, 8), (3, 8),
+            (2, 8), (1, 8), (0, 8),
+        ),
+        (
+            (-1, 8), (-2, 8), (-3, 8), (-4, 8), (-5, 8), (-6, 8),
+            (-7, 8), (-8, 8), (8, -7), (8, -6), (8, -5), (8, -4),
+            (8, -3), (8, -2), (8, -1),
+        ),
+    )
+
+    # Module coordinates (x, y) of the version information bits, from the least significant bit,
+    # in the two 6x3 blocks: above the bottom-left and left of the top-right finder patterns
+    VERSION_INFORMATION_POSITIONS = (
+        (
+            (-11, 0), (-10, 0), (-9, 0), (-11, 1), (-10, 1), (-9, 1),
+            (-11, 2), (-10, 2), (-9, 2), (-11, 3), (-10, 3), (-9, 3),
+            (-11, 4), (-10, 4), (-9, 4), (-11, 5), (-10, 5), (-9, 5),
+        ),
+        (
+            (0, -11), (0, -10), (0, -9), (1, -11), (1, -10), (1, -9),
+            (2, -11), (2, -10), (2, -9), (3, -11), (3, -10), (3, -9),
+            (4, -11), (4, -10), (4, -9), (5, -11), (5, -10), (5, -9),
+        ),
+    )
+
+    # GF(256) multiplication tables by coefficient, filled lazily
+    _GF_MULTIPLICATION_TABLES = {}
+
+    # Reed-Solomon remainder (LFSR) tables by number of ECC code words, filled lazily
+    _RS_REMAINDER_TABLES = {}
+
+    # Pattern splitting non-ASCII data into runs, including kanji runs, built lazily
+    _KANJI_CHARACTER_RUN_PATTERN = None
+
+    # Capacity index by error correction level, filled lazily
+    _CAPACITY_INDEX = {}
+
+    # Block transpose shifts and masks by plane width, filled lazily
+    _TRANSPOSE_MASKS = {}
+
+    # Data module placement orders by version, filled lazily
+    _PLACEMENT_ORDERS = {}
+
+    # Function pattern templates by version, filled lazily
+    _FUNCTION_TEMPLATES = {}
+
+    # NumPy product tables (feedback byte x generator) by number of ECC code words, filled lazily
+    _RS_BATCH_TABLES = {}
+
+    # Mask bitplanes with their format information difference (packed modules, rows plane and columns plane)
+    # by version and mask pattern, filled lazily
+    _MASK_PLANES = {}
+
+    # Constant penalty planes (all modules, outside of the matrix) by symbol size, filled lazily
+    _PENALTY_PLANES = {}
+
+    # Sampled lines and their constant penalty planes by symbol size, filled lazily
+    _SAMPLE_PLANES = {}
+
+    # Mask selection profiles:
+    # spec: all eight masks scored with the full penalty rules (ISO/IEC 18004)
+    # fast: all eight masks scored with a penalty estimate on a subset of the lines
+    # fixed: the mask pattern given by the caller, nothing is scored
+    QUALITY_PROFILES = ('spec', 'fast', 'fixed')
+
+    # Image formats of render_qr_code
+    IMAGE_FORMATS = ('png', 'svg', 'text', 'pbm', 'bmp')
+
+    # Symbols of payloads up to this length in UTF-8 bytes (versions 1 to 4) are generated inline by the async API:
+    # they take a few hundred microseconds, not worth a hop to the executor and its queue
+    # Images always go to the executor, their rendering time grows with the pixel count (24 ms for a PNG at scale 100)
+    ASYNC_INLINE_LENGTH = 32
+
+    def __init__(self, data, error_correction='H', quality='spec', mask_pattern=None):
         self.data = data
         self.version = None
         self.encoding_mode = None
+        self.character_runs = None
+        self.segments = None
         self.error_correction = error_correction
         self.module_size = None
         self.quiet_zone_size = None
-        self.mask_pattern = None
+        self.mask_pattern = mask_pattern
+        self.quality = quality
         self.image_factory = None
+        self.qr_matrix = None
 
     def determine_best_encoding_mode(self):
-        # Check if input string consists of only decimal digits
-        if all(char in self.NUMERIC_CHARSET for char in self.data):
-            self.encoding_mode = 'numeric'
-            return
-
-        # Check if input string can be encoded in alphanumeric mode
-        if all(char in self.ALPHANUMERIC_CHARSET for char in self.data):
-            self.encoding_mode = 'alphanumeric'
-            return
+        # Split the data into character runs, kept on the generator for determine_smallest_version
+        self.character_runs = self.get_character_runs(self.data)
+        self.encoding_mode = self.get_encoding_mode(self.character_runs)
 
+    @classmethod
+    def get_character_runs(cls, data):
         # Check if input string can be encoded in UTF-8
         try:
-            self.data.encode('utf-8')
-            self.encoding_mode = 'byte'
-            return
+            data.encode('utf-8')
         except UnicodeEncodeError:
-            pass
-
-        # If none of the above conditions are met, raise an error
-        raise ValueError('Unable to determine the best encoding mode for the input string.')
-
-    def get_encoding_mode_indicator(self):
-        return self.ENCODING_MODE_INDICATOR[self.encoding_mode]
+            # If it cannot be encoded, raise an error
+            raise ValueError('Unable to determine the best encoding mode for the input string.') from None
+
+        # Split the input string into runs of numeric, alphanumeric, kanji and byte only characters
+        # The runs are the units of the segmentation done in get_smallest_version
+        if data.isascii():
+            character_run_pattern = cls.CHARACTER_RUN_PATTERN
+        else:
+            character_run_pattern = cls.get_kanji_character_run_pattern()
+
+        return [(match.lastgroup, match.group()) for match in character_run_pattern.finditer(data)]
+
+    @classmethod
+    def get_encoding_mode(cls, segments):
+        # A single run (or segment) is encoded in a single mode, otherwise mixed modes are considered
+        match len(segments):
+            case 0:
+                # An empty payload has no segment, all of its (zero) characters are numeric
+                return 'numeric'
+            case 1:
+                return segments[0][0]
+            case _:
+                return 'mixed'
+
+    @classmethod
+    def get_kanji_character_run_pattern(cls):
+        # Kanji mode encodes the characters with a double byte Shift JIS code
+        # in the ranges 0x8140-0x9FFC and 0xE040-0xEBBF
+        # Built on first use with non-ASCII data and shared by all generator instances
+        pattern = cls._KANJI_CHARACTER_RUN_PATTERN
+        if pattern is None:
+            kanji_code_points = []
+            for lead_byte in chain(range(0x81, 0xA0), range(0xE0, 0xEC)):
+                for trail_byte in chain(range(0x40, 0x7F), range(0x80, 0xFD)):
+                    if lead_byte == 0xEB and trail_byte > 0xBF:
+                        break
+
+                    code = bytes((lead_byte, trail_byte))
+                    try:
+                        char = code.decode('shift_jis')
+                    except UnicodeDecodeError:
+                        continue
+
+                    # Keep only characters that encode back to the same code
+                    if char.encode('shift_jis') == code:
+                        kanji_code_points.append(ord(char))
+
+            # Compress the sorted code points into a character class of ranges
+            ranges = []
+            for code_point in sorted(kanji_code_points):
+                if ranges and ranges[-1][1] == code_point - 1:
+                    ranges[-1][1] = code_point
+                else:
+                    ranges.append([code_point, code_point])
+            kanji_charset = ''.join(chr(first) if first == last else f'{chr(first)}-{chr(last)}' for first, last in ranges)
+
+            pattern = re.compile(
+                r'(?P<numeric>[0-9]+)|(?P<alphanumeric>[A-Z $%*+\-./:]+)'
+                rf'|(?P<kanji>[{kanji_charset}]+)|(?P<byte>[^0-9A-Z $%*+\-./:{kanji_charset}]+)'
+            )
+            cls._KANJI_CHARACTER_RUN_PATTERN = pattern
+
+        return pattern
+
+    @classmethod
+    def get_encoding_mode_indicator(cls, encoding_mode):
+        return cls.ENCODING_MODE_INDICATOR[encoding_mode]
+
+    @classmethod
+    def get_data_bits_length(cls, encoding_mode, data):
+        # Number of bits of the encoded data (without EMI and CCI) in the given encoding mode
+        match encoding_mode:
+            case 'numeric':
+                # 10 bits per group of three digits, 7 or 4 bits for the last group of two or one digit
+                data_length = len(data)
+                return data_length // 3 * 10 + (0, 4, 7)[data_length % 3]
+            case 'alphanumeric':
+                # 11 bits per pair of characters, 6 bits for the last single character
+                data_length = len(data)
+                return data_length // 2 * 11 + data_length % 2 * 6
+            case 'byte':
+                # 8 bits per UTF-8 byte, not per character
+                return len(data.encode('utf-8')) * 8
+            case 'kanji':
+                # 13 bits per character
+                return len(data) * 13
+            case _:
+                raise ValueError(f'Invalid encoding mode: {encoding_mode}')
+
+    @classmethod
+    def get_segments_bits_length(cls, segments, version):
+        # Number of bits of all the segments with their EMI and CCI
+        return sum(
+            4 + cls.get_character_count_indicator_bits(encoding_mode, version) + cls.get_data_bits_length(encoding_mode, data)
+            for encoding_mode, data in segments
+        )
+
+    @classmethod
+    def get_optimal_segments(cls, character_runs, version):
+        # Find the segmentation of the character runs with the shortest bitstream
+        # for versions sharing the CCI lengths of the given version
+        # Dynamic programming over the runs, costs are counted in 1/6 bits so that
+        # numeric (10/3 bits) and alphanumeric (11/2 bits) characters have integer costs
+        header_costs = {
+            encoding_mode: (4 + cls.get_character_count_indicator_bits(encoding_mode, version)) * 6
+            for encoding_mode in cls.ENCODING_MODE_INDICATOR
+        }
+
+        # Best cost of a bitstream ending with an open segment in each mode
+        costs = {}
+        # For each run: mode of the run -> mode of the previous run on the best path
+        previous_modes = []
+
+        for character_class, data in character_runs:
+            run_costs = {}
+            run_previous_modes = {}
+            for encoding_mode in cls.CHARACTER_CLASS_ENCODING_MODES[character_class]:
+                # Byte mode pays per UTF-8 byte
+                if encoding_mode == 'byte':
+                    data_cost = cls.CHARACTER_COSTS[encoding_mode] * len(data.encode('utf-8'))
+                else:
+                    data_cost = cls.CHARACTER_COSTS[encoding_mode] * len(data)
+
+                # First run always opens a new segment
+                best_cost = header_costs[encoding_mode]
+                best_previous_mode = None
+
+                for previous_mode, previous_cost in costs.items():
+                    # Continue the open segment, or round it up to whole bits and open a new one
+                    if previous_mode == encoding_mode:
+                        cost = previous_cost
+                    else:
+                        cost = -(-previous_cost // 6) * 6 + header_costs[encoding_mode]
+
+                    if best_previous_mode is None or cost < best_cost:
+                        best_cost = cost
+                        best_previous_mode = previous_mode
+
+                run_costs[encoding_mode] = best_cost + data_cost
+                run_previous_modes[encoding_mode] = best_previous_mode
+
+            costs = run_costs
+            previous_modes.append(run_previous_modes)
+
+        if not costs:
+            return []
+
+        # Walk the best path back from the cheapest final mode
+        encoding_mode = min(costs, key=lambda mode: -(-costs[mode] // 6))
+        run_modes = []
+        for run_previous_modes in reversed(previous_modes):
+            run_modes.append(encoding_mode)
+            encoding_mode = run_previous_modes[encoding_mode]
+        run_modes.reverse()
+
+        # Merge consecutive runs encoded in the same mode into one segment
+        segments = []
+        for encoding_mode, (_, data) in zip(run_modes, character_runs):
+            if segments and segments[-1][0] == encoding_mode:
+                segments[-1] = (encoding_mode, segments[-1][1] + data)
+            else:
+                segments.append((encoding_mode, data))
+
+        return segments
+
+    @classmethod
+    def get_capacity_index(cls, error_correction):
+        # Sorted data bits of versions 1 to 40 for an error correction level
+        # Built once per error correction level and shared by all generator instances
+        capacity_index = cls._CAPACITY_INDEX.get(error_correction)
+        if capacity_index is None:
+            capacity_index = tuple(cls.CAPACITIES_TABLE[version][error_correction]['max_bits'] for version in range(1, 41))
+            cls._CAPACITY_INDEX[error_correction] = capacity_index
+
+        return capacity_index
 
     def determine_smallest_version(self):
-        # Calculate data length
-        data = self.data
-        data_length = len(data)
-
-        # Get the maximum capacity for the chosen encoding mode and error correction level
-        max_capacity = self.CAPACITIES_TABLE[40][self.error_correction][self.encoding_mode]
-
-         # Check if the data length exceeds the maximum capacity
-        if data_length > max_capacity:
-            raise ValueError(f'Input data exceeds the maximum capacity for {self.encoding_mode} encoding mode and error correction level {self.error_correction}.')
-
-        # Iterate through QR code versions to find the smallest version that can accommodate the data
-        for version, capacities in self.CAPACITIES_TABLE.items():
-            # Check if the data length fits within the capacity for the chosen error correction level and encoding mode
-            capacity = capacities[self.error_correction][self.encoding_mode]
-            if data_length <= capacity:
-                self.version = version
-                return
-
-
-    def determine_character_count_indicator_bits(self):
-        # Determine CCI bits count according to the QR Code version
-        match self.encoding_mode:
+        # Smallest version and its segments for the character runs of determine_best_encoding_mode
+        self.version, self.segments = self.get_smallest_version(self.character_runs, self.error_correction)
+        self.encoding_mode = self.get_encoding_mode(self.segments)
+
+    @classmethod
+    def get_smallest_version(cls, character_runs, error_correction):
+        capacity_index = cls.get_capacity_index(error_correction)
+
+        # Versions sharing the same CCI lengths share the optimal segmentation,
+        # so try each range of versions from the smallest one
+        for first_version, last_version in cls.CHARACTER_COUNT_INDICATOR_VERSION_RANGES:
+            segments = cls.get_optimal_segments(character_runs, first_version)
+
+            # Calculate the real encoded data length in bits
+            bits_length = cls.get_segments_bits_length(segments, first_version)
+
+            # Binary search for the smallest version of the range that can accommodate the data
+            position = bisect_left(capacity_index, bits_length, first_version - 1, last_version)
+            if position < last_version:
+                return position + 1, segments
+
+        # The data length exceeds the maximum capacity
+        raise ValueError(f'Input data exceeds the maximum capacity for error correction level {error_correction}.')
+
+    def determine_character_count_indicator_bits(self, encoding_mode, version=None):
+        # Determine CCI bits count according to the QR Code version, the generator version by default
+        return self.get_character_count_indicator_bits(encoding_mode, self.version if version is None else version)
+
+    @classmethod
+    def get_character_count_indicator_bits(cls, encoding_mode, version):
+        # CCI bits count of an encoding mode in a version
+        match encoding_mode:
             case 'numeric':
-                if self.version in range(1, 10):
+                if version in range(1, 10):
                     return 10
-                elif self.version in range(10, 27):
+                elif version in range(10, 27):
                     return 12
-                elif self.version in range(27, 41):
+                elif version in range(27, 41):
                     return 14
             case 'alphanumeric':
-                if self.version in range(1, 10):
+                if version in range(1, 10):
                     return 9
-                elif self.version in range(10, 27):
+                elif version in range(10, 27):
                     return 11
-                elif self.version in range(27, 41):
+                elif version in range(27, 41):
                     return 13
             case 'byte':
-                if self.version in range(1, 10):
+                if version in range(1, 10):
                     return 8
-                elif self.version in range(10, 41):
+                elif version in range(10, 41):
                     return 16
+            case 'kanji':
+                if version in range(1, 10):
+                    return 8
+                elif version in range(10, 27):
+                    return 10
+                elif version in range(27, 41):
+                    return 12
             case _:
-                raise ValueError(f'Invalid encoding mode: {self.encoding_mode}')
+                raise ValueError(f'Invalid encoding mode: {encoding_mode}')
 
-    def get_character_count_indicator(self):
-        # Convert data length to binary - get CCI
-        character_count_indicator = format(len(self.data), f'0{self.determine_character_count_indicator_bits()}b')
+    @classmethod
+    def get_character_count_indicator(cls, encoding_mode, data):
+        # Data length - value of the CCI
+        # Byte mode counts UTF-8 bytes, not characters
+        if encoding_mode == 'byte':
+            return len(data.encode('utf-8'))
 
-        return character_count_indicator
+        return len(data)
 
-    def encode_numeric(self,):
+    @classmethod
+    def encode_numeric(cls, bit_buffer, data):
         # Check if input data contains only numeric characters
-        if not self.data.isdigit():
+        if any(char not in cls.NUMERIC_CHARSET for char in data):
             raise ValueError('Invalid input data. Numeric encoding mode requires numeric characters only.')
 
         # Implement numeric data encoding logic
-        encoded_data = ''
-
         # Split digit data into groups of three or less
-        groups = [self.data[i:i+3] for i in range(0, len(self.data), 3)]
+        for i in range(0, len(data), 3):
+            group = data[i:i+3]
 
-        # Convert each group to binary
-        for group in groups:
-            # Convert group to 10-bit, 7-bit or 4-bit binary
+            # Append group as 10-bit, 7-bit or 4-bit value
             # depending on len(group) - count of digits
             match len(group):
                 case 3:
-                    encoded_group = format(int(group), '010b')
+                    bit_buffer.append(int(group), 10)
                 case 2:
-                    encoded_group = format(int(group), '07b')
+                    bit_buffer.append(int(group), 7)
                 case 1:
-                    encoded_group = format(int(group), '04b')
+                    bit_buffer.append(int(group), 4)
                 case _:
                     raise ValueError(f'Invalid data group size: {len(group)}')
 
-            encoded_data += encoded_group
-
-        return encoded_data
-
-    def encode_alphanumeric(self):
+    @classmethod
+    def encode_alphanumeric(cls, bit_buffer, data):
         # Implement alphanumeric data encoding logic
         alphanumeric_charset = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:'
 
         # Check if input data contains only alphanumeric characters
-        if any(char not in alphanumeric_charset for char in self.data):
+        if any(char not in alphanumeric_charset for char in data):
             raise ValueError('Invalid input data. Alphanumeric encoding mode requires alphanumeric characters only.')
 
-        # Initialize encoded data string
-        encoded_data = ''
-
         # Divide data into groups of two characters
-        groups = [self.data[i:i+2] for i in range(0, len(self.data), 2)]
+        for i in range(0, len(data), 2):
+            group = data[i:i+2]
 
-        for group in groups:
-            # Convert group to 11-bit or 6-bit binary
+            # Append group as 11-bit or 6-bit value
             # depending on len(group) - count of digits
             match len(group):
                 case 2:
                     index1 = alphanumeric_charset.index(group[0])
                     index2 = alphanumeric_charset.index(group[1])
 
-                    encoded_group = format(index1 * 45 + index2, '011b')
+                    bit_buffer.append(index1 * 45 + index2, 11)
                 case 1:
-                    encoded_group = format(alphanumeric_charset.index(group[0]), '06b')
+                    bit_buffer.append(alphanumeric_charset.index(group[0]), 6)
                 case _:
                     raise ValueError(f'Invalid data group size: {len(group)}')
 
-            encoded_data += encoded_group
-
-        return encoded_data
-
-    def encode_byte(self):
+    @classmethod
+    def encode_byte(cls, bit_buffer, data):
         # Implement binary data encoding logic
-        # Encode data in UTF-8 byte mode
-        utf8_encoded_data = self.data.encode('utf-8')
-
-        # Convert each byte into binary and pad to 8 bits
-        encoded_data = ''.join(format(byte, '08b') for byte in utf8_encoded_data)
-
-        return encoded_data
-
-    def encode_data(self):
-        # Determine encoding mode based on chosen option
-        match self.encoding_mode:
-            case 'numeric':
-                return self.encode_numeric()
-            case 'alphanumeric':
-                return self.encode_alphanumeric()
-            case 'byte':
-                return self.encode_byte()
-            case _:
-                raise ValueError(f'Invalid encoding mode: {self.encoding_mode}')
+        # Encode data in UTF-8 byte mode, every byte is written as is
+        bit_buffer.append_bytes(data.encode('utf-8'))
+
+    @classmethod
+    def encode_kanji(cls, bit_buffer, data):
+        # Implement kanji data encoding logic
+        for char in data:
+            # Check if the character has a double byte Shift JIS code in the kanji mode ranges
+            try:
+                code = int.from_bytes(char.encode('shift_jis'), 'big')
+            except UnicodeEncodeError:
+                code = 0
+
+            if 0x8140 <= code <= 0x9FFC:
+                code -= 0x8140
+            elif 0xE040 <= code <= 0xEBBF:
+                code -= 0xC140
+            else:
+                raise ValueError('Invalid input data. Kanji encoding mode requires double byte Shift JIS characters only.')
+
+            # Multiply the most significant byte by 0xC0, add the least significant byte, append as 13-bit value
+            bit_buffer.append((code >> 8) * 0xC0 + (code & 0xFF), 13)
+
+    @classmethod
+    def encode_data(cls, bit_buffer, segments, version):
+        # Write every segment: EMI, CCI and the data in the segment encoding mode
+        for encoding_mode, data in segments:
+            bit_buffer.append(cls.get_encoding_mode_indicator(encoding_mode), 4)
+            bit_buffer.append(cls.get_character_count_indicator(encoding_mode, data), cls.get_character_count_indicator_bits(encoding_mode, version))
+
+            # Determine encoding mode based on chosen option
+            match encoding_mode:
+                case 'numeric':
+                    cls.encode_numeric(bit_buffer, data)
+                case 'alphanumeric':
+                    cls.encode_alphanumeric(bit_buffer, data)
+                case 'byte':
+                    cls.encode_byte(bit_buffer, data)
+                case 'kanji':
+                    cls.encode_kanji(bit_buffer, data)
+                case _:
+                    raise ValueError(f'Invalid encoding mode: {encoding_mode}')
 
 
-    def pad_encoded_data(self, pad_emi_cci_data_sequence, required_bits):
+    @classmethod
+    def pad_encoded_data(cls, bit_buffer, required_bits):
         # Add terminator of up to four 0s if necessary
-        if len(pad_emi_cci_data_sequence) < required_bits:
-            terminator_length = min(4, required_bits - len(pad_emi_cci_data_sequence))
-            pad_emi_cci_data_sequence += '0' * terminator_length
+        if len(bit_buffer) < required_bits:
+            terminator_length = min(4, required_bits - len(bit_buffer))
+            bit_buffer.append(0, terminator_length)
 
         # Add more 0s to make the length a multiple of 8
-        if len(pad_emi_cci_data_sequence) % 8 != 0:
-            padding_length = 8 - (len(pad_emi_cci_data_sequence) % 8)
-            pad_emi_cci_data_sequence += '0' * padding_length
+        bit_buffer.pad_to_byte()
 
-        # Add pad bytes if the string is still too short
-        while len(pad_emi_cci_data_sequence) < required_bits:
-            pad_emi_cci_data_sequence += '11101100'  # Pad byte 1
-            if len(pad_emi_cci_data_sequence) < required_bits:
-                pad_emi_cci_data_sequence += '00010001'  # Pad byte 2
+        # Add pad bytes if the sequence is still too short
+        # Pad bytes 11101100 and 00010001 alternate
+        pad_bytes_count = (required_bits - len(bit_buffer)) // 8
+        if pad_bytes_count > 0:
+            bit_buffer.append_bytes(b'\xec\x11' * (pad_bytes_count // 2) + b'\xec' * (pad_bytes_count % 2))
 
-        return pad_emi_cci_data_sequence
+        return bit_buffer
 
     def get_emi_cci_data_sequence(self):
-        # Obtaining a string of bits that consists of the EMI, the character count indicator, and the data bits
-        emi_cci_data_sequence = self.get_encoding_mode_indicator() + self.get_character_count_indicator() + self.encode_data()
+        # Data code words of the segments of determine_smallest_version
+        return self.get_data_codewords(self.segments, self.version, self.error_correction)
+
+    @classmethod
+    def get_data_codewords(cls, segments, version, error_correction):
+        # Writing a sequence of bits that consists of the EMI, the character count indicator, and the data bits of every segment
+        bit_buffer = BitBuffer()
+        cls.encode_data(bit_buffer, segments, version)
 
         # Determine the required number of bits for this QR code
-        required_bits = self.CAPACITIES_TABLE[self.version][self.error_correction]['max_bits']
+        required_bits = cls.CAPACITIES_TABLE[version][error_correction]['max_bits']
 
         # Pad encoded data if necessary
-        padded_encoded_data = self.pad_encoded_data(emi_cci_data_sequence, required_bits)
+        cls.pad_encoded_data(bit_buffer, required_bits)
 
         # Convert to bytearray
-        splitted_padded_encoded_data = [padded_encoded_data[i:i+8] for i in range(0, len(padded_encoded_data), 8)]
-        int_padded_encoded_data = [int(i, 2) for i in splitted_padded_encoded_data]
-        final_data_sequence = bytearray(int_padded_encoded_data)
+        final_data_sequence = bit_buffer.to_bytearray()
 
         return final_data_sequence
 
     def rs_encode_data(self):
-        '''Reed-Solomon main encoding function, using polynomial division (algorithm Extended Synthetic Division)'''
-        # Original message
-        msg_in = self.get_emi_cci_data_sequence()
-
-        # Given number of error correction symbols
-        nsym = self.ECCWBI[self.version][self.error_correction][0]
+        # Final message of the data code words of determine_smallest_version: data and ECC code words of every block, interleaved
+        return self.add_error_correction(self.get_emi_cci_data_sequence(), self.version, self.error_correction)
 
+    @classmethod
+    def rs_encode_message(cls, msg_in, nsym):
+        '''Reed-Solomon encoding of one block, using polynomial division (algorithm Extended Synthetic Division)'''
+        # Scalar reference of rs_encode_blocks: the message followed by its nsym ECC code words
         # Generator polynomial
-        gen = self.GENERATOR_POLYNOMIALS[nsym]
+        gen = cls.GENERATOR_POLYNOMIALS[nsym]
 
         # Cache lengths for faster access inside loops
         msg_in_len = len(msg_in)
@@ -1531,81 +2207,1226 @@ class QRCodeGenerator:
         msg_out = bytearray(msg_in) + bytearray(gen_len-1)
 
         # Precompute the logarithm of every items in the generator
-        lgen = bytearray([self.GALOIS_LOG[gen[j]] for j in range(len(gen))])
+        lgen = bytearray([cls.GALOIS_LOG[gen[j]] for j in range(len(gen))])
 
         # Synthetic division main loop
         for i in range(msg_in_len):
             coef = msg_out[i] # Note that it's msg_out here, not msg_in. Thus, we reuse the updated value at each iteration (this is how Synthetic Division works: instead of storing in a temporary register the intermediate values, we directly commit them to the output).
             if coef != 0: # log(0) is undefined, so we need to manually check for this case. There's no need to check the divisor here because we know it can't be 0 since we generated it.
-                lcoef = self.GALOIS_LOG[coef] # Precaching
+                lcoef = cls.GALOIS_LOG[coef] # Precaching
                 # In synthetic division, we always skip the first coefficient of the divisior, because it's only used to normalize the dividend coefficient (which is here useless since the divisor, the generator polynomial, is always monic)
                 # If gen[j] != 0: # log(0) is undefined so we need to check that, but it slow things down in fact and it's useless in our case (reed-solomon encoding) since we know that all coefficients in the generator are not 0
                 for j in range(1, gen_len):
-                    msg_out[i + j] ^= self.GALOIS_ANTILOG[lcoef + lgen[j]] # It's equivalent to an addition and to an XOR). In other words, this is simply a "multiply-accumulate operation"
+                    msg_out[i + j] ^= cls.GALOIS_ANTILOG[lcoef + lgen[j]] # It's equivalent to an addition and to an XOR). In other words, this is simply a "multiply-accumulate operation"
 
         # Recopy the original message bytes (overwrites the part where the quotient was computed)
         msg_out[:msg_in_len] = msg_in # Bytarray format
 
         return msg_out
 
-    def divide_data_into_blocks(self, encoded_data):
+    @classmethod
+    def get_gf_multiplication_table(cls, coefficient):
+        # Translation table mapping every byte x to x * coefficient in GF(256)
+        # Built on first use and shared by all generator instances
+        table = cls._GF_MULTIPLICATION_TABLES.get(coefficient)
+        if table is None:
+            log_coefficient = cls.GALOIS_LOG[coefficient]
+            table = bytes([0] + [cls.GALOIS_ANTILOG[cls.GALOIS_LOG[x] + log_coefficient] for x in range(1, 256)])
+            cls._GF_MULTIPLICATION_TABLES[coefficient] = table
+
+        return table
+
+    @classmethod
+    def get_rs_remainder_table(cls, nsym):
+        # LFSR table for a generator of nsym ECC code words:
+        # entry f is the feedback byte f multiplied by the generator (without its leading 1),
+        # packed into an nsym bytes int that is XORed into the remainder register at once
+        # Built on first use of the ECC length and shared by all generator instances
+        table = cls._RS_REMAINDER_TABLES.get(nsym)
+        if table is None:
+            gen_tables = [cls.get_gf_multiplication_table(coef) for coef in cls.GENERATOR_POLYNOMIALS[nsym][1:]]
+            table = tuple(int.from_bytes(bytes(products), 'big') for products in zip(*gen_tables))
+            cls._RS_REMAINDER_TABLES[nsym] = table
+
+        return table
+
+    @classmethod
+    def rs_encode_blocks(cls, blocks, nsym):
+        '''Reed-Solomon encoding of several blocks of the same length, using a table driven remainder register (LFSR)'''
+        table = cls.get_rs_remainder_table(nsym)
+
+        # The top byte of the register is the feedback, the rest is shifted up by one byte per message byte
+        feedback_shift = 8 * (nsym - 1)
+        register_mask = (1 << feedback_shift) - 1
+
+        ecc_blocks = []
+        for block in blocks:
+            remainder = 0
+            # One table lookup and one wide XOR per message byte
+            for byte in block:
+                remainder = ((remainder & register_mask) << 8) ^ table[(remainder >> feedback_shift) ^ byte]
+
+            # The final register content is the ECC code words
+            ecc_blocks.append(bytearray(remainder.to_bytes(nsym, 'big')))
+
+        return ecc_blocks
+
+    @classmethod
+    def get_rs_batch_table(cls, nsym):
+        # (256, nsym) uint8 array: row f holds f multiplied by every generator coefficient (without the leading 1)
+        table = cls._RS_BATCH_TABLES.get(nsym)
+        if table is None:
+            galois_log = numpy.array(cls.GALOIS_LOG, dtype=numpy.intp)
+            galois_antilog = numpy.array(cls.GALOIS_ANTILOG, dtype=numpy.uint8)
+            lgen = galois_log[cls.GENERATOR_POLYNOMIALS[nsym][1:]]
+
+            # Vectorised log/antilog multiplication, log(0) is undefined so row 0 stays 0
+            table = numpy.zeros((256, nsym), dtype=numpy.uint8)
+            table[1:] = galois_antilog[galois_log[1:, None] + lgen[None, :]]
+            table.setflags(write=False)
+            cls._RS_BATCH_TABLES[nsym] = table
+
+        return table
+
+    @classmethod
+    def rs_encode_batch(cls, blocks, nsym):
+        '''Reed-Solomon encoding of an (N, k) uint8 array of data blocks into the (N, nsym) array of ECC code words'''
+        # The result is always a NumPy array, so this needs NumPy: without it, rs_encode_blocks
+        # gives the same code words as a list of bytearrays
+        if numpy is None:
+            raise ImportError('rs_encode_batch requires NumPy, use rs_encode_blocks without it')
+
+        blocks = numpy.asarray(blocks, dtype=numpy.uint8)
+        if blocks.ndim != 2:
+            raise ValueError(f'Expected an (N, k) array of data blocks, got shape {blocks.shape}')
+
+        table = cls.get_rs_batch_table(nsym)
+
+        # Remainder registers of all blocks, one row per block
+        remainder = numpy.zeros((blocks.shape[0], nsym), dtype=numpy.uint8)
+        for i in range(blocks.shape[1]):
+            # Feedback bytes of every register, then shift all registers by one byte
+            feedback = remainder[:, 0] ^ blocks[:, i]
+            remainder[:, :-1] = remainder[:, 1:]
+            remainder[:, -1] = 0
+
+            # Add (XOR) feedback * generator to every register at once
+            remainder ^= table[feedback]
+
+        return remainder
+
+    @classmethod
+    def divide_data_into_blocks(cls, encoded_data, version, error_correction):
         # Determine the number of blocks and error correction codewords for each block
         # depending on version and error correction
-        ecc_info = self.ECCWBI[self.version][self.error_correction]
+        ecc_info = cls.ECCWBI[version][error_correction]
 
-        # Number of error correction codes per block
-        ec_codewords_per_block = ecc_info[0]
-        
         # Info abount block count and number of data code words per block
         # [(block1_count, block1_data_code_words),(block2_count, block2_data_code_words)]
         block_info = [(ecc_info[i], ecc_info[i + 1]) for i in range(1, len(ecc_info), 2)]
 
-        # Divide the encoded data into blocks
-        blocks = []
+        # Divide the encoded data into groups of blocks of the same length
+        groups = []
         start_index = 0
-        for ec_count, data_count in block_info:
-            block = encoded_data[start_index:start_index + data_count]
-            blocks.append((block, ec_count))
-            start_index += data_count
+        for block_count, data_count in block_info:
+            if block_count == 0:
+                continue
 
-        return blocks
+            group = []
+            for _ in range(block_count):
+                group.append(encoded_data[start_index:start_index + data_count])
+                start_index += data_count
+            groups.append(group)
 
+        return groups
+
+    def apply_error_correction(self):
+        # Apply error correction coding to the QR code data
+        return self.add_error_correction(self.get_emi_cci_data_sequence(), self.version, self.error_correction)
+
+    @classmethod
+    def add_error_correction(cls, encoded_data, version, error_correction):
+        # Final message of the data code words: interleaved data and error correction code words
+        # Number of error correction codes per block
+        ec_codewords_per_block = cls.ECCWBI[version][error_correction][0]
+
+        # Blocks of one group have the same length and are encoded in a single pass
+        data_blocks = []
+        ecc_blocks = []
+        for group in cls.divide_data_into_blocks(encoded_data, version, error_correction):
+            data_blocks += group
+            ecc_blocks += cls.rs_encode_blocks(group, ec_codewords_per_block)
+
+        # Interleave data code words: columns present in every block first,
+        # then the extra code word of the longer group 2 blocks
+        shortest_block_length = len(data_blocks[0])
+        final_message = bytearray(chain.from_iterable(zip(*data_blocks)))
+        final_message += bytes(block[-1] for block in data_blocks if len(block) > shortest_block_length)
+
+        # Interleave error correction code words
+        final_message += bytes(chain.from_iterable(zip(*ecc_blocks)))
+
+        return final_message
+
+
+    @classmethod
+    def get_function_template(cls, version):
+        # Immutable matrix with all function patterns of a version, its version information
+        # and the reserved format information areas, the same for every symbol of the version
+        # Built once per version and shared by all generator instances
+        template = cls._FUNCTION_TEMPLATES.get(version)
+        if template is None:
+            matrix = QRMatrix(21 + (version - 1) * 4)
+
+            # Add function patterns and version information, reserve the format information areas
+            cls.add_finder_patterns(matrix)
+            cls.add_alignment_patterns(matrix)
+            cls.add_timing_patterns(matrix)
+            cls.add_dark_module(matrix)
+            cls.reserve_format_areas(matrix)
+            cls.add_version_information(matrix)
+
+            # bytes storage makes the template read only, copies get bytearrays
+            template = QRMatrix(matrix.size, bytes(matrix.modules), bytes(matrix.function_mask))
+            cls._FUNCTION_TEMPLATES[version] = template
+
+        return template
+
+    @classmethod
+    def add_finder_patterns(cls, matrix):
+        # Finder patterns in the top-left, top-right and bottom-left corners, with their light separators
+        size = matrix.size
+        for left, top in ((0, 0), (size - 7, 0), (0, size - 7)):
+            for dy in range(-1, 8):
+                for dx in range(-1, 8):
+                    x = left + dx
+                    y = top + dy
+                    if 0 <= x < size and 0 <= y < size:
+                        # Distance from the center: 3x3 dark square, light ring, dark ring, light separator
+                        distance = max(abs(dx - 3), abs(dy - 3))
+                        matrix.set_function(x, y, distance != 2 and distance != 4)
+
+    @classmethod
+    def add_alignment_patterns(cls, matrix):
+        # Alignment patterns at every combination of the center coordinates,
+        # except the three that overlap the finder patterns
+        positions = cls.ALIGNMENT_PATTERN_POSITIONS[(matrix.size - 17) // 4]
+        first, last = (positions[0], positions[-1]) if positions else (None, None)
+        for center_y in positions:
+            for center_x in positions:
+                if (center_x, center_y) in ((first, first), (first, last), (last, first)):
+                    continue
+
+                for dy in range(-2, 3):
+                    for dx in range(-2, 3):
+                        # Dark center, light ring, dark ring
+                        matrix.set_function(center_x + dx, center_y + dy, max(abs(dx), abs(dy)) != 1)
+
+    @classmethod
+    def add_timing_patterns(cls, matrix):
+        # Add timing patterns to the QR code matrix
+        # Alternating modules in row 6 and column 6 between the finder patterns, starting with dark
+        for i in range(8, matrix.size - 8):
+            matrix.set_function(i, 6, i % 2 == 0)
+            matrix.set_function(6, i, i % 2 == 0)
+
+    @classmethod
+    def add_dark_module(cls, matrix):
+        # Always dark module next to the bottom-left finder pattern
+        matrix.set_function(8, matrix.size - 8)
+
+    @classmethod
+    def reserve_format_areas(cls, matrix):
+        # Reserve the format information modules around the finder patterns
+        size = matrix.size
+        for positions in cls.FORMAT_INFORMATION_POSITIONS:
+            for x, y in positions:
+                matrix.set_function(x % size, y % size, 0)
+
+    @classmethod
+    def get_placement_order(cls, version):
+        # Positions of the data modules in placement order: the two module wide columns,
+        # zigzagging up and down from the bottom-right corner and skipping the function pattern modules
+        # A position is the bit index in the packed modules (y * stride * 8 + x)
+        # Built once per version and shared by all generator instances
+        placement_order = cls._PLACEMENT_ORDERS.get(version)
+        if placement_order is None:
+            template = cls.get_function_template(version)
+            size = template.size
+            row_bits = template.stride * 8
+            placement_order = array('H')
+
+            right = size - 1
+            while right >= 1:
+                # The vertical timing pattern column is skipped as a whole
+                if right == 6:
+                    right = 5
+
+                upward = (right + 1) & 2 == 0
+                for vertical in range(size):
+                    y = size - 1 - vertical if upward else vertical
+                    for x in (right, right - 1):
+                        if not template.is_function(x, y):
+                            placement_order.append(y * row_bits + x)
+
+                right -= 2
+
+            # Read only view, shared by all threads
+            placement_order = memoryview(placement_order).toreadonly()
+            cls._PLACEMENT_ORDERS[version] = placement_order
+
+        return placement_order
+
+    @classmethod
+    def place_data(cls, matrix, encoded_data):
+        # Scatter the codeword bits to the precomputed data module positions
+        # Remainder bits after the last codeword stay light
+        placement_order = cls.get_placement_order((matrix.size - 17) // 4)
+
+        if numpy is not None:
+            # One vectorised assignment of all bits into an unpacked copy of the matrix, then pack it back
+            bits = numpy.unpackbits(numpy.frombuffer(encoded_data, dtype=numpy.uint8))
+            unpacked_data = numpy.zeros(len(matrix.modules) * 8, dtype=numpy.uint8)
+            unpacked_data[numpy.frombuffer(placement_order, dtype=numpy.uint16)[:len(bits)]] = bits
+            numpy.frombuffer(matrix.modules, dtype=numpy.uint8)[:] |= numpy.packbits(unpacked_data)
+            return
+
+        # Only dark modules need to be written
+        modules = matrix.modules
+        bits = chain.from_iterable(map(cls.BYTE_BITS.__getitem__, encoded_data))
+        for position in compress(placement_order, bits):
+            modules[position >> 3] |= 0x80 >> (position & 7)
 
     def generate_matrix(self, encoded_data):
         # Generate QR code matrix based on encoded data
-        # Determine QR code size based on version and encoding mode
-        qr_size = 21 + (self.version - 1) * 4
+        return self.get_data_matrix(encoded_data, self.version)
 
-        # Initialize QR code matrix with white modules
-        qr_matrix = [[0] * qr_size for _ in range(qr_size)]
+    @classmethod
+    def get_data_matrix(cls, encoded_data, version):
+        # Start from a copy of the function patterns template of the version
+        qr_matrix = cls.get_function_template(version).copy()
 
         # Add encoded data to QR code matrix
-        # This is just a placeholder, actual implementation depends on the QR code structure
+        cls.place_data(qr_matrix, encoded_data)
 
         return qr_matrix
 
-    def add_quiet_zone(self):
-        # Add quiet zone around the QR code matrix
-        pass
+    @classmethod
+    def get_plane_width(cls, size):
+        # Line width of the penalty planes: a power of two (so that a plane can be transposed
+        # by swapping blocks) with at least 8 bits of padding after every line
+        return 1 << (size + 7).bit_length()
+
+    @classmethod
+    def get_plane(cls, modules, size):
+        # Pack the rows of packed modules into one int, every line padded to the plane width
+        # The first line is the most significant, the leftmost module of a line is its most significant bit
+        stride = (size + 7) // 8
+        plane_width = cls.get_plane_width(size)
+        line_padding = bytes(plane_width // 8 - stride)
+        plane_bytes = line_padding.join(modules[y * stride:(y + 1) * stride] for y in range(size))
+
+        return int.from_bytes(plane_bytes.ljust(plane_width * plane_width // 8, b'\x00'), 'big')
+
+    @classmethod
+    def get_transpose_masks(cls, plane_width):
+        # For every block size b: shift between the top-right and bottom-left b x b blocks
+        # and the mask selecting the bottom-left blocks of every 2b x 2b block
+        transpose_masks = cls._TRANSPOSE_MASKS.get(plane_width)
+        if transpose_masks is None:
+            transpose_masks = []
+            line_bytes = plane_width // 8
+            empty_line = bytes(line_bytes)
+            block_size = plane_width // 2
+            while block_size:
+                line = sum(1 << (plane_width - 1 - x) for x in range(plane_width) if (x // block_size) % 2 == 0).to_bytes(line_bytes, 'big')
+                mask = int.from_bytes(b''.join(line if (y // block_size) % 2 else empty_line for y in range(plane_width)), 'big')
+                transpose_masks.append((block_size * (plane_width - 1), mask))
+                block_size //= 2
+
+            transpose_masks = tuple(transpose_masks)
+            cls._TRANSPOSE_MASKS[plane_width] = transpose_masks
+
+        return transpose_masks
+
+    @classmethod
+    def transpose_plane(cls, plane, size):
+        # Rows of the transposed plane are the columns of the matrix
+        plane_width = cls.get_plane_width(size)
+
+        if numpy is not None:
+            plane_bytes = numpy.frombuffer(plane.to_bytes(plane_width * plane_width // 8, 'big'), dtype=numpy.uint8)
+            bits = numpy.unpackbits(plane_bytes).reshape(plane_width, plane_width)
+            return int.from_bytes(numpy.packbits(bits.T).tobytes(), 'big')
+
+        # Recursive block transpose: swap the top-right and bottom-left blocks, halving the block size at every step
+        for shift, mask in cls.get_transpose_masks(plane_width):
+            swap = (plane ^ (plane >> shift)) & mask
+            plane ^= swap | (swap << shift)
+
+        return plane
+
+    @classmethod
+    def get_mask_rows(cls, version, mask_pattern):
+        # Rows of the mask bitplane: modules switched by the mask pattern, function pattern modules excluded
+        template = cls.get_function_template(version)
+        size = template.size
+        full_row = (1 << size) - 1
+        mask_function = cls.MASK_PATTERNS[mask_pattern]
+
+        # All mask patterns repeat every 6 columns, so every row is a 6 bit group repeated over the row width,
+        repeats = size // 6 + 1
+        repeat_unit = ((1 << (6 * repeats)) - 1) // 63
+
+        # and rows repeat every 12 rows
+        repeated_rows = []
+        for y in range(12):
+            group = sum(mask_function(x, y) << (5 - x) for x in range(6))
+            repeated_rows.append((group * repeat_unit) >> (6 * repeats - size))
+
+        mask_rows = []
+        for y in range(size):
+            mask_rows.append(repeated_rows[y % 12] & ~template.function_row(y) & full_row)
+
+        return mask_rows
+
+    @classmethod
+    def get_packed_rows(cls, rows, size):
+        # Rows as ints to packed modules
+        padding = (-size) % 8
+        stride = (size + 7) // 8
+        return b''.join((row << padding).to_bytes(stride, 'big') for row in rows)
+
+    @classmethod
+    def get_mask_planes(cls, version, mask_pattern):
+        # Mask bitplanes of a version: the packed modules as an int (for apply_mask),
+        # the rows and columns planes (for the penalty evaluation) and their sampled lines (for the estimate)
+        # The format information (a linear BCH code) of a mask pattern differs from the one of mask pattern 0
+        # by the same bits at every error correction level: that difference is folded in, so a data matrix
+        # with the format information of mask pattern 0 XOR these planes is the finished symbol
+        # Built once per version and mask pattern and shared by all generator instances
+        mask_planes = cls._MASK_PLANES.get((version, mask_pattern))
+        if mask_planes is None:
+            size = 21 + (version - 1) * 4
+            mask_matrix = QRMatrix(size, bytearray(cls.get_packed_rows(cls.get_mask_rows(version, mask_pattern), size)))
+            cls.set_format_bits(mask_matrix, cls.get_format_information('M', mask_pattern) ^ cls.get_format_information('M', 0))
+            mask_modules = bytes(mask_matrix.modules)
+            rows_plane = cls.get_plane(mask_modules, size)
+            columns_plane = cls.transpose_plane(rows_plane, size)
+            mask_planes = (int.from_bytes(mask_modules, 'big'), rows_plane, columns_plane,
+                           cls.get_sampled_plane(rows_plane, size), cls.get_sampled_plane(columns_plane, size))
+            cls._MASK_PLANES[(version, mask_pattern)] = mask_planes
+
+        return mask_planes
+
+    @classmethod
+    def get_penalty_planes(cls, size):
+        # Planes that only depend on the symbol size:
+        # all the modules of the matrix (padding bits clear),
+        # and the modules outside the matrix (padding bits and 4 bits above the first line), which count as light
+        penalty_planes = cls._PENALTY_PLANES.get(size)
+        if penalty_planes is None:
+            plane_bits = cls.get_plane_width(size) ** 2
+            full_row = ((1 << size) - 1) << ((-size) % 8)
+            module_plane = cls.get_plane(full_row.to_bytes((size + 7) // 8, 'big') * size, size)
+            penalty_planes = (module_plane, (~module_plane & ((1 << plane_bits) - 1)) | (0xF << plane_bits))
+            cls._PENALTY_PLANES[size] = penalty_planes
+
+        return penalty_planes
+
+    @classmethod
+    def get_sample_planes(cls, size):
+        # Lines scored by the penalty estimate: pairs of neighbouring lines every 8 lines,
+        # with the planes of all modules and of the outside of these lines,
+        # and the plane of the second line of every pair (where a 2x2 block of a pair ends)
+        sample_planes = cls._SAMPLE_PLANES.get(size)
+        if sample_planes is None:
+            plane_width = cls.get_plane_width(size)
+            sample_lines = tuple(y + i for y in range(0, size - 1, 8) for i in (0, 1))
+            sample_bits = plane_width * len(sample_lines)
+            full_line = (((1 << size) - 1) << (plane_width - size)).to_bytes(plane_width // 8, 'big')
+            empty_line = bytes(plane_width // 8)
+
+            module_plane = int.from_bytes(full_line * len(sample_lines), 'big')
+            outside_plane = (~module_plane & ((1 << sample_bits) - 1)) | (0xF << sample_bits)
+            pair_plane = int.from_bytes((empty_line + full_line) * (len(sample_lines) // 2), 'big')
+            sample_planes = (sample_lines, module_plane, outside_plane, pair_plane)
+            cls._SAMPLE_PLANES[size] = sample_planes
+
+        return sample_planes
+
+    @classmethod
+    def get_sampled_plane(cls, plane, size):
+        # Plane made of the sampled lines of a plane only
+        line_bytes = cls.get_plane_width(size) // 8
+        plane_bytes = plane.to_bytes(line_bytes * line_bytes * 8, 'big')
+        sample_lines = cls.get_sample_planes(size)[0]
+
+        return int.from_bytes(b''.join(plane_bytes[y * line_bytes:(y + 1) * line_bytes] for y in sample_lines), 'big')
+
+    @classmethod
+    def evaluate_line_penalty(cls, plane, module_plane, outside_plane):
+        # N1 + N3 penalty score of every line of a plane
+        score = 0
+        light_plane = ~plane & module_plane
+
+        # N1: runs of 5 + i modules of the same color score 3 + i
+        # Windows of 5 dark (light) modules, padding bits are neither dark nor light
+        for color_plane in (plane, light_plane):
+            windows = color_plane & (color_plane >> 1) & (color_plane >> 2) & (color_plane >> 3) & (color_plane >> 4)
+            # A run of length L has L - 4 windows, every run adds 2 more points
+            score += windows.bit_count() + 2 * (windows & ~(windows >> 1)).bit_count()
+
+        # N3: 1:1:3:1:1 (dark:light:dark:light:dark) pattern preceded or followed by 4 light modules
+        # Modules outside the matrix are light
+        outside_light_plane = light_plane | outside_plane
+        finder_like = (plane & (outside_light_plane >> 1) & (plane >> 2) & (plane >> 3) & (plane >> 4)
+                       & (outside_light_plane >> 5) & (plane >> 6))
+        light_areas = outside_light_plane & (outside_light_plane >> 1) & (outside_light_plane >> 2) & (outside_light_plane >> 3)
+        score += 40 * (finder_like & ((light_areas >> 7) | (light_areas << 4))).bit_count()
+
+        return score
+
+    @classmethod
+    def evaluate_block_penalty(cls, plane, module_plane, plane_width, block_plane=-1):
+        # N2: every 2x2 block of modules of the same color scores 3
+        # A block is counted on its bottom-right module, only where block_plane is set
+        light_plane = ~plane & module_plane
+        vertical_same = ((plane & (plane >> plane_width)) | (light_plane & (light_plane >> plane_width)))
+        horizontal_same = ((plane & (plane >> 1)) | (light_plane & (light_plane >> 1)))
+
+        return 3 * (vertical_same & (vertical_same >> 1) & horizontal_same & block_plane).bit_count()
+
+    @classmethod
+    def evaluate_dark_penalty(cls, dark_modules, size):
+        # N4: 10 points for every 5% of dark modules away from 50%
+        return 10 * (abs(dark_modules * 20 - size * size * 10) // (size * size))
+
+    @classmethod
+    def evaluate_penalty(cls, rows_plane, columns_plane, size, best_score=None):
+        # Penalty score of a masked matrix (N1 + N2 + N3 + N4), computed on whole planes
+        # The rules are added from the cheapest, and the evaluation stops as soon as the partial score
+        # reaches best_score: the returned score is then only a lower bound, but the mask can no longer win
+        module_plane, outside_plane = cls.get_penalty_planes(size)
+        score = cls.evaluate_dark_penalty(rows_plane.bit_count(), size)
+        score += cls.evaluate_block_penalty(rows_plane, module_plane, cls.get_plane_width(size))
+
+        for plane in (rows_plane, columns_plane):
+            if best_score is not None and score >= best_score:
+                return score
+
+            score += cls.evaluate_line_penalty(plane, module_plane, outside_plane)
+
+        return score
+
+    @classmethod
+    def estimate_penalty(cls, sampled_rows_plane, sampled_columns_plane, dark_modules, size):
+        # Penalty estimate of a masked matrix: N1, N2 and N3 on the sampled rows and columns only,
+        # extrapolated to the whole matrix, and the exact N4
+        # The score is scaled by the number of sampled lines to stay an int
+        sample_lines, module_plane, outside_plane, pair_plane = cls.get_sample_planes(size)
+        line_score = cls.evaluate_line_penalty(sampled_rows_plane, module_plane, outside_plane)
+        line_score += cls.evaluate_line_penalty(sampled_columns_plane, module_plane, outside_plane)
+        block_score = cls.evaluate_block_penalty(sampled_rows_plane, module_plane, cls.get_plane_width(size), pair_plane)
+
+        # N1 and N3 are sampled on len(sample_lines) of size lines,
+        # N2 on len(sample_lines) / 2 of the size - 1 pairs of neighbouring rows
+        return line_score * size + block_score * 2 * (size - 1) + cls.evaluate_dark_penalty(dark_modules, size) * len(sample_lines)
+
+    def determine_best_mask_pattern(self, matrix):
+        # Evaluate all eight mask patterns and keep the one with the lowest penalty score
+        self.mask_pattern = self.get_best_mask_pattern(matrix, self.error_correction)
+        return self.mask_pattern
+
+    @classmethod
+    def get_best_mask_pattern(cls, matrix, error_correction):
+        # Mask pattern with the lowest penalty score of the finished symbol (format and version information included)
+        size = matrix.size
+        version = (size - 17) // 4
+
+        # Masking and the format information are an XOR, so the planes of a finished symbol
+        # are the planes of the data matrix (with the format information of mask pattern 0) XOR the cached mask planes
+        rows_plane = cls.get_plane(cls.get_format_base_modules(matrix, error_correction), size)
+        columns_plane = cls.transpose_plane(rows_plane, size)
+
+        best_score = None
+        for mask_pattern in range(8):
+            _, mask_rows_plane, mask_columns_plane, _, _ = cls.get_mask_planes(version, mask_pattern)
+
+            # Masks that can no longer beat the best one stop early
+            score = cls.evaluate_penalty(rows_plane ^ mask_rows_plane, columns_plane ^ mask_columns_plane, size, best_score)
+            if best_score is None or score < best_score:
+                best_score = score
+                best_mask_pattern = mask_pattern
+
+        return best_mask_pattern
+
+    @classmethod
+    def estimate_best_mask_pattern(cls, matrix, error_correction):
+        # Mask pattern with the lowest penalty estimate of the finished symbol
+        size = matrix.size
+        version = (size - 17) // 4
+        rows_plane = cls.get_plane(cls.get_format_base_modules(matrix, error_correction), size)
+        sampled_rows_plane = cls.get_sampled_plane(rows_plane, size)
+        sampled_columns_plane = cls.get_sampled_plane(cls.transpose_plane(rows_plane, size), size)
+
+        best_score = None
+        for mask_pattern in range(8):
+            _, mask_rows_plane, _, mask_sampled_rows_plane, mask_sampled_columns_plane = cls.get_mask_planes(version, mask_pattern)
+
+            score = cls.estimate_penalty(sampled_rows_plane ^ mask_sampled_rows_plane, sampled_columns_plane ^ mask_sampled_columns_plane,
+                                         (rows_plane ^ mask_rows_plane).bit_count(), size)
+            if best_score is None or score < best_score:
+                best_score = score
+                best_mask_pattern = mask_pattern
+
+        return best_mask_pattern
+
+    @classmethod
+    def select_mask_pattern(cls, matrix, error_correction, quality='spec', mask_pattern=None):
+        # Choose the mask pattern according to the quality profile
+        match quality:
+            case 'spec':
+                return cls.get_best_mask_pattern(matrix, error_correction)
+            case 'fast':
+                return cls.estimate_best_mask_pattern(matrix, error_correction)
+            case 'fixed':
+                if mask_pattern not in range(8):
+                    raise ValueError(f'Invalid mask pattern: {mask_pattern}')
+                return mask_pattern
+            case _:
+                raise ValueError(f'Invalid quality profile: {quality}')
+
+    @classmethod
+    def apply_mask(cls, matrix, error_correction, mask_pattern):
+        # Write the format information of mask pattern 0, then XOR the mask bitplane
+        # (with the format information difference of the mask pattern) into the packed modules
+        cls.add_format_information(matrix, error_correction, 0)
+        mask_modules = cls.get_mask_planes((matrix.size - 17) // 4, mask_pattern)[0]
+        matrix.modules[:] = (int.from_bytes(matrix.modules, 'big') ^ mask_modules).to_bytes(len(matrix.modules), 'big')
+
+    @classmethod
+    def get_format_information(cls, error_correction, mask_pattern):
+        # 15 bits format information of the error correction level and mask pattern
+        return cls.FORMAT_INFORMATION[error_correction][mask_pattern]
+
+    @classmethod
+    def add_format_information(cls, matrix, error_correction, mask_pattern):
+        # Write the format information of the error correction level and mask pattern
+        cls.set_format_bits(matrix, cls.get_format_information(error_correction, mask_pattern))
+
+    @classmethod
+    def get_format_base_modules(cls, matrix, error_correction):
+        # Packed modules of a data matrix with the format information of mask pattern 0, the base of the mask planes
+        base_matrix = matrix.copy()
+        cls.add_format_information(base_matrix, error_correction, 0)
+        return base_matrix.modules
+
+    @classmethod
+    def set_format_bits(cls, matrix, format_information):
+        # Write 15 format bits twice, at the precomputed module coordinates
+        size = matrix.size
+        for positions in cls.FORMAT_INFORMATION_POSITIONS:
+            for i, (x, y) in enumerate(positions):
+                matrix.set(x % size, y % size, format_information >> i & 1)
+
+    @classmethod
+    def get_version_information(cls, version):
+        # 18 bits version information of the version
+        return cls.VERSION_INFORMATION[version]
+
+    @classmethod
+    def add_version_information(cls, matrix):
+        # Write the version information in the two 6x3 blocks of versions 7 and above (into the function template)
+        version = (matrix.size - 17) // 4
+        if version < 7:
+            return
 
-    def add_timing_patterns(self):
-        # Add timing patterns to the QR code matrix
-        pass
+        size = matrix.size
+        version_information = cls.get_version_information(version)
+        for positions in cls.VERSION_INFORMATION_POSITIONS:
+            for i, (x, y) in enumerate(positions):
+                matrix.set_function(x % size, y % size, version_information >> i & 1)
 
-    def apply_error_correction(self):
-        # Apply error correction coding to the QR code data
-        pass
-
-    def render_qr_code(self):
+    def add_quiet_zone(self, quiet_zone_size=4):
+        # Add quiet zone around the QR code matrix
+        # The light border (4 modules in the standard) is not stored in the matrix,
+        # the renderers add it to every row they write
+        self.quiet_zone_size = quiet_zone_size
+
+    def get_render_matrix(self):
+        # QR code matrix to render, generated on first use,
+        # with the standard quiet zone unless set before
+        if self.qr_matrix is None:
+            self.generate_qr_code()
+        if self.quiet_zone_size is None:
+            self.add_quiet_zone()
+
+        return self.qr_matrix
+
+    def get_module_size(self, module_size=None):
+        # Pixels per module of one rendering: the given size, else the generator module_size, else 10
+        # The generator is left untouched, a size given to one rendering does not leak into the next ones
+        if module_size is not None:
+            return module_size
+        if self.module_size is not None:
+            return self.module_size
+
+        return 10
+
+    def get_render_rows(self):
+        # Matrix rows framed by the light rows of the quiet zone
+        quiet_rows = [0] * self.quiet_zone_size
+        return chain(quiet_rows, self.get_render_matrix().rows(), quiet_rows)
+
+    def get_scaled_bits(self, row, module_size, light='0', dark='1'):
+        # One scanline of a matrix row as a string of pixels: the quiet zone on both sides
+        # and every module repeated module_size times
+        quiet_zone = light * (self.quiet_zone_size * module_size)
+        modules = format(row, f'0{self.qr_matrix.size}b').translate({48: light * module_size, 49: dark * module_size})
+
+        return quiet_zone + modules + quiet_zone
+
+    def get_scaled_row(self, row, module_size, light='0', dark='1'):
+        # Packed bits of one scanline of a matrix row, with light bits up to whole bytes
+        bits = self.get_scaled_bits(row, module_size, light, dark)
+        bits += light * (-len(bits) % 8)
+
+        return int(bits, 2).to_bytes(len(bits) // 8, 'big')
+
+    def render_qr_code(self, output, image_format='png', module_size=None):
         # Render the QR code matrix as a visual representation
-        pass
+        # into a binary file-like object, a bytearray or a writable byte memoryview
+        if isinstance(output, (bytearray, memoryview)):
+            output = BufferWriter(output)
+
+        match image_format:
+            case 'png':
+                self.write_png(output, module_size)
+            case 'svg':
+                output.writelines(chunk.encode() for chunk in self.iter_svg(module_size))
+            case 'text':
+                output.writelines(f'{line}\n'.encode() for line in self.iter_text_lines())
+            case 'pbm':
+                self.write_pbm(output, module_size)
+            case 'bmp':
+                self.write_bmp(output, module_size)
+            case _:
+                raise ValueError(f'Invalid image format: {image_format}')
+
+    @classmethod
+    def write_png_chunk(cls, output, chunk_type, data):
+        # Length, type, data and CRC of the type and data
+        output.write(len(data).to_bytes(4, 'big') + chunk_type + data + zlib.crc32(data, zlib.crc32(chunk_type)).to_bytes(4, 'big'))
+
+    def write_png(self, output, module_size=None):
+        # 1 bit grayscale PNG (0 is black), streamed scanline by scanline through zlib:
+        # the full upscaled image is never held in memory
+        qr_matrix = self.get_render_matrix()
+        module_size = self.get_module_size(module_size)
+        width = (qr_matrix.size + 2 * self.quiet_zone_size) * module_size
+
+        output.write(b'\x89PNG\r\n\x1a\n')
+        # Width, height, bit depth 1, color type 0 (grayscale), compression 0, filter 0, no interlace
+        self.write_png_chunk(output, b'IHDR', width.to_bytes(4, 'big') * 2 + bytes((1, 0, 0, 0, 0)))
+
+        # Every module row gives module_size identical scanlines, and neighbouring rows are often identical
+        # (quiet zone, finder patterns): each group of identical scanlines is built and compressed in one go
+        compressor = zlib.compressobj()
+        for row, rows in groupby(self.get_render_rows()):
+            # Every scanline starts with the filter type 0 (None)
+            scanline = b'\x00' + self.get_scaled_row(row, module_size, '1', '0')
+            data = compressor.compress(scanline * (len(list(rows)) * module_size))
+            if data:
+                self.write_png_chunk(output, b'IDAT', data)
+
+        self.write_png_chunk(output, b'IDAT', compressor.flush())
+        self.write_png_chunk(output, b'IEND', b'')
+
+    def render_into(self, buffer, stride, x=0, y=0, scale=None, bits_per_pixel=8, dark=0, light=255):
+        # Write the scaled symbol and its quiet zone straight into a writable buffer (bytearray, mmap, NumPy array...)
+        # with its top-left corner at pixel (x, y), rows of the buffer being stride bytes apart
+        # Pixels are bytes (8 bits per pixel), or bits with the leftmost pixel as the most significant bit
+        # (1 bit per pixel, the lowest bit of dark and light), pixels around the symbol are left untouched
+        qr_matrix = self.get_render_matrix()
+        scale = self.get_module_size(scale)
+        width = (qr_matrix.size + 2 * self.quiet_zone_size) * scale
+        canvas = memoryview(buffer).cast('B')
+
+        match bits_per_pixel:
+            case 8:
+                start = x
+                span = width
+            case 1:
+                start = x // 8
+                span = (x % 8 + width + 7) // 8
+            case _:
+                raise ValueError(f'Invalid bits per pixel: {bits_per_pixel}')
+
+        if x < 0 or y < 0 or start + span > stride or (y + width - 1) * stride + start + span > len(canvas):
+            raise ValueError('The symbol does not fit in the buffer')
+
+        offset = y * stride + start
+        if bits_per_pixel == 8:
+            pixel_values = bytes.maketrans(b'01', bytes((light, dark)))
+            for row, repeats in groupby(self.get_render_rows()):
+                line = self.get_scaled_bits(row, scale).encode().translate(pixel_values)
+                for _ in range(len(list(repeats)) * scale):
+                    canvas[offset:offset + span] = line
+                    offset += stride
+            return
+
+        # Bytes at both ends of a line are shared with the pixels around the symbol, they are merged under a mask
+        shift = span * 8 - x % 8 - width
+        line_mask = ((1 << width) - 1) << shift
+        for row, repeats in groupby(self.get_render_rows()):
+            line = int(self.get_scaled_bits(row, scale, str(light & 1), str(dark & 1)), 2) << shift
+            for _ in range(len(list(repeats)) * scale):
+                canvas_line = int.from_bytes(canvas[offset:offset + span], 'big')
+                canvas[offset:offset + span] = ((canvas_line & ~line_mask) | line).to_bytes(span, 'big')
+                offset += stride
+
+    def get_bitmap_length(self, image_format, module_size=None):
+        # Length in bytes of a PBM or BMP image, to size an output buffer
+        qr_matrix = self.get_render_matrix()
+        width = (qr_matrix.size + 2 * self.quiet_zone_size) * self.get_module_size(module_size)
+        match image_format:
+            case 'pbm':
+                return len(f'P4\n{width} {width}\n') + (width + 7) // 8 * width
+            case 'bmp':
+                return 62 + (width + 31) // 32 * 4 * width
+            case _:
+                raise ValueError(f'Invalid image format: {image_format}')
+
+    def write_bitmap_rows(self, output, rows, module_size, row_padding=b''):
+        # 1 bit per pixel rows, dark = 1: every module row is scaled once and written module_size times,
+        # identical neighbouring rows are written together
+        for row, repeats in groupby(rows):
+            output.write((self.get_scaled_row(row, module_size) + row_padding) * (len(list(repeats)) * module_size))
+
+    def write_pbm(self, output, module_size=None):
+        # Binary portable bitmap (P4), rows are packed bits with 1 for black
+        qr_matrix = self.get_render_matrix()
+        module_size = self.get_module_size(module_size)
+        width = (qr_matrix.size + 2 * self.quiet_zone_size) * module_size
+        output.write(f'P4\n{width} {width}\n'.encode())
+        self.write_bitmap_rows(output, self.get_render_rows(), module_size)
+
+    def write_bmp(self, output, module_size=None):
+        # 1 bit per pixel BMP, palette index 0 is white and 1 is black
+        # Rows are stored bottom-up, each padded to a multiple of 4 bytes
+        qr_matrix = self.get_render_matrix()
+        module_size = self.get_module_size(module_size)
+        width = (qr_matrix.size + 2 * self.quiet_zone_size) * module_size
+        row_bytes = (width + 7) // 8
+        image_length = (row_bytes + (-row_bytes % 4)) * width
+
+        # File header, info header (40 bytes, 2835 pixels per meter = 72 dpi) and the 2 colors palette
+        output.write(struct.pack('<2sIHHI', b'BM', 62 + image_length, 0, 0, 62))
+        output.write(struct.pack('<IiiHHIIiiII', 40, width, width, 1, 1, 0, image_length, 2835, 2835, 2, 2))
+        output.write(b'\xff\xff\xff\x00\x00\x00\x00\x00')
+        self.write_bitmap_rows(output, reversed(list(self.get_render_rows())), module_size, bytes(-row_bytes % 4))
+
+    def iter_svg(self, module_size=None):
+        # SVG image as a generator of string chunks: one chunk per matrix row
+        # Every horizontal run of dark modules is a 1 module wide stroke of one path,
+        # moving from run to run with relative commands
+        qr_matrix = self.get_render_matrix()
+        size = qr_matrix.size
+        quiet_zone_size = self.quiet_zone_size
+        image_size = size + 2 * quiet_zone_size
+        pixels = image_size * self.get_module_size(module_size)
+
+        yield (f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" viewBox="0 0 {image_size} {image_size}">'
+               f'<path fill="#fff" d="M0 0h{image_size}v{image_size}H0z"/><path stroke="#000" d="')
+
+        # Current point of the path, strokes run along the middle of the rows
+        x = 0
+        y = None
+        for image_y, row in enumerate(qr_matrix.rows(), quiet_zone_size):
+            commands = []
+            for run in re.finditer('1+', format(row, f'0{size}b')):
+                start, end = (quiet_zone_size + position for position in run.span())
+                if y is None:
+                    # The path starts with the only absolute move
+                    commands.append(f'M{start} {image_y + 0.5}')
+                else:
+                    commands.append(f'm{start - x} {image_y - y}')
+                commands.append(f'h{end - start}')
+                x, y = end, image_y
+
+            if commands:
+                yield ''.join(commands)
+
+        yield '"/></svg>'
+
+    def iter_text_lines(self, invert=False):
+        # Terminal lines of half block characters, every line shows two rows of modules
+        # Use invert on terminals with a dark background, the light modules are then drawn
+        qr_matrix = self.get_render_matrix()
+        width = qr_matrix.size + 2 * self.quiet_zone_size
+        # Rows are shifted to start after the quiet zone and end on a whole hex digit
+        padding = -width % 4
+        shift = self.quiet_zone_size + padding
+        digits = (width + padding) // 4
+        inverse = ((1 << width) - 1) << padding if invert else 0
+
+        rows = [format(((row << shift) ^ inverse), f'0{digits}x') for row in self.get_render_rows()]
+        # An odd last row is paired with an empty row
+        if len(rows) % 2:
+            rows.append('0' * digits)
+
+        glyphs = self.HALF_BLOCK_GLYPHS
+        for top, bottom in zip(rows[::2], rows[1::2]):
+            yield ''.join(map(glyphs.__getitem__, map(str.__add__, top, bottom)))[:width]
+
+    def get_text(self, invert=False):
+        # Whole terminal rendering as a string
+        return '\n'.join(self.iter_text_lines(invert))
+
+    @classmethod
+    def encode(cls, data, error_correction='H', quality='spec', mask_pattern=None):
+        # Functional pipeline: payload and options to an immutable QRCode
+        # Nothing is stored on the class or on an instance, the shared tables are only read
+        # (or filled once with immutable values), so any number of threads can encode at the same time
+        character_runs = cls.get_character_runs(data)
+        version, segments = cls.get_smallest_version(character_runs, error_correction)
+        encoded_data = cls.add_error_correction(cls.get_data_codewords(segments, version, error_correction), version, error_correction)
+        qr_matrix = cls.get_data_matrix(encoded_data, version)
+
+        # Mask the data modules and write the format information in one XOR,
+        # the version information is already in the function template
+        mask_pattern = cls.select_mask_pattern(qr_matrix, error_correction, quality, mask_pattern)
+        cls.apply_mask(qr_matrix, error_correction, mask_pattern)
+
+        # bytes storage makes the matrix read only, like the templates
+        qr_matrix = QRMatrix(qr_matrix.size, bytes(qr_matrix.modules), cls.get_function_template(version).function_mask)
+
+        return QRCode(data, error_correction, version, cls.get_encoding_mode(segments), tuple(segments), mask_pattern, qr_matrix)
 
     def generate_qr_code(self):
+        # Run the whole pipeline and keep its results on the generator, for the renderers
+        self.set_qr_code(self.encode(self.data, self.error_correction, self.quality, self.mask_pattern))
+        return self.qr_matrix
+
+    def set_qr_code(self, qr_code):
+        # Keep the results of encode on the generator, the renderers then use them without encoding again
+        self.version = qr_code.version
+        self.encoding_mode = qr_code.encoding_mode
+        self.segments = qr_code.segments
+        self.mask_pattern = qr_code.mask_pattern
+        self.qr_matrix = qr_code.matrix
+
+    @classmethod
+    def warm_up(cls, error_correction=None):
+        # Build the shared tables of every version once: capacity index, kanji pattern, Reed-Solomon tables
+        # of the error correction level (all levels if None), function templates, placement orders and mask planes
+        error_correction_levels = cls.ERROR_CORRECTION_LEVEL_BITS if error_correction is None else (error_correction,)
+        cls.get_kanji_character_run_pattern()
+        for level in error_correction_levels:
+            cls.get_capacity_index(level)
+        for version in range(1, 41):
+            cls.get_placement_order(version)
+            for level in error_correction_levels:
+                cls.get_rs_remainder_table(cls.ECCWBI[version][level][0])
+            for mask_pattern in range(8):
+                cls.get_mask_planes(version, mask_pattern)
+
+    @classmethod
+    def generate_item(cls, data, error_correction='H', output=None, module_size=None):
+        # One item of generate_many: the QR code matrix, or the image bytes in the output format
+        generator = cls(data, error_correction)
+        qr_matrix = generator.generate_qr_code()
+        if output is None:
+            return qr_matrix
+
+        image = bytearray()
+        generator.render_qr_code(image, output, module_size)
+        return bytes(image)
+
+    @classmethod
+    def generate_many(cls, payloads, error_correction='H', output=None, workers=None, chunksize=64, module_size=None):
+        # Generate the QR codes of many payloads, sharded in chunks over a pool of worker processes
+        # Results are streamed back as an iterator, in the order of the payloads
+        # workers defaults to the number of CPUs, with 1 everything runs in the calling process
+        # Every process warms up the shared tables once, before its first item
+        # Invalid options are rejected by the call itself, before the pool starts:
+        # warm_up would fail in every worker, and the pool would respawn them forever
+        if error_correction not in cls.ERROR_CORRECTION_LEVEL_BITS:
+            raise ValueError(f'Invalid error correction level: {error_correction}')
+        if output is not None and output not in cls.IMAGE_FORMATS:
+            raise ValueError(f'Invalid image format: {output}')
+
+        generate_item = partial(cls.generate_item, error_correction=error_correction, output=output, module_size=module_size)
+
+        def iter_items():
+            if workers == 1:
+                cls.warm_up(error_correction)
+                yield from map(generate_item, payloads)
+                return
+
+            with Pool(workers, cls.warm_up, (error_correction,)) as pool:
+                yield from pool.imap(generate_item, payloads, chunksize)
+
+        return iter_items()
+
+    @classmethod
+    async def agenerate(cls, data, error_correction='H', output=None, module_size=None, executor=None):
+        # Async generate_item: the work runs in the executor (the loop default executor if None,
+        # a process pool needs warm_up as its initializer), the symbols of small payloads run inline
+        # Cancelling the caller cancels the work if it has not started yet, otherwise its result is dropped
+        generate_item = partial(cls.generate_item, data, error_correction=error_correction, output=output, module_size=module_size)
+        if output is None and len(data.encode('utf-8')) <= cls.ASYNC_INLINE_LENGTH:
+            return generate_item()
+
+        return await asyncio.get_running_loop().run_in_executor(executor, generate_item)
+
+    @classmethod
+    async def agenerate_many(cls, payloads, error_correction='H', output=None, module_size=None, executor=None, concurrency=8):
+        # Async generate_many: results in the order of the payloads, at most concurrency items in flight
+        # Leaving the iteration early (or cancelling it) cancels the items in flight
+        pending = deque()
+        try:
+            for data in payloads:
+                pending.append(asyncio.ensure_future(cls.agenerate(data, error_correction, output, module_size, executor)))
+                if len(pending) >= concurrency:
+                    yield await pending.popleft()
+
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @classmethod
+    async def aiter_image(cls, data, image_format='png', error_correction='H', module_size=None, executor=None, chunk_size=65536):
+        # Rendered image as async chunks of chunk_size bytes (the last one shorter), ready to be written to a response stream
+        # A thread executor (the loop default executor if None) streams the chunks while the image is rendered,
+        # a process pool can only send the whole image back, which is then cut in chunks
+        if isinstance(executor, ProcessPoolExecutor):
+            image = await cls.agenerate(data, error_correction, image_format, module_size, executor)
+            for start in range(0, len(image), chunk_size):
+                yield image[start:start + chunk_size]
+            return
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        writer = QueueWriter(loop, queue, chunk_size)
+
+        def render():
+            # None marks the end of the image, or a failure raised by the future
+            try:
+                cls(data, error_correction).render_qr_code(writer, image_format, module_size)
+                writer.flush()
+            except BrokenPipeError:
+                return
+            finally:
+                if not writer.closed:
+                    loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        future = loop.run_in_executor(executor, render)
+        try:
+            while (chunk := await queue.get()) is not None:
+                yield chunk
+            await future
+        finally:
+            # Leaving the iteration early stops the rendering at its next write
+            writer.close()
+
+
+class QRCodeCache:
+    # Thread safe two tier LRU cache with a byte budget shared by both tiers:
+    # 'matrix' entries are encoded symbols (QRCode) keyed by the encode arguments,
+    # which fully determine the encoding mode, version and mask,
+    # 'image' entries are rendered images (bytes) keyed by the same arguments plus format, scale and quiet zone
+    # Values are immutable, so they are shared without copies
+
+    # Approximate memory of an entry besides its data: key tuple, OrderedDict node, result objects
+    ENTRY_OVERHEAD = 400
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.counters = {tier: {'hits': 0, 'misses': 0, 'evictions': 0} for tier in ('matrix', 'image')}
+
+    @classmethod
+    def get_entry_size(cls, key, value):
+        # Bytes held by an entry: payload of the key, packed modules or image bytes, and the fixed overhead
+        if isinstance(value, QRCode):
+            value_size = len(value.matrix.modules)
+        else:
+            value_size = len(value)
+
+        return sys.getsizeof(key[1]) + value_size + cls.ENTRY_OVERHEAD
+
+    def get(self, key):
+        # Cached value of a key (its first item is the tier) or None, a hit makes it the most recently used
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.counters[key[0]]['misses'] += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.counters[key[0]]['hits'] += 1
+            return value[0]
+
+    def put(self, key, value):
+        # Store a value, evicting the least recently used entries of both tiers to stay within the budget
+        # A value larger than the whole budget is not stored
+        entry_size = self.get_entry_size(key, value)
+        if entry_size > self.max_bytes:
+            return
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+
+            self.entries[key] = (value, entry_size)
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                evicted_key, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.counters[evicted_key[0]]['evictions'] += 1
+
+    @classmethod
+    def get_matrix_key(cls, data, error_correction='H', quality='spec', mask_pattern=None):
+        return ('matrix', data, error_correction, quality, mask_pattern)
+
+    @classmethod
+    def get_image_key(cls, data, error_correction='H', image_format='png', module_size=10, quiet_zone_size=4, quality='spec', mask_pattern=None):
+        return ('image', data, error_correction, quality, mask_pattern, image_format, module_size, quiet_zone_size)
+
+    def encode(self, data, error_correction='H', quality='spec', mask_pattern=None):
+        # QRCodeGenerator.encode through the matrix tier
+        key = self.get_matrix_key(data, error_correction, quality, mask_pattern)
+        qr_code = self.get(key)
+        if qr_code is None:
+            qr_code = QRCodeGenerator.encode(data, error_correction, quality, mask_pattern)
+            self.put(key, qr_code)
+
+        return qr_code
+
+    def render(self, data, error_correction='H', image_format='png', module_size=10, quiet_zone_size=4, quality='spec', mask_pattern=None):
+        # Rendered image bytes through the image tier, a miss renders the symbol of the matrix tier
+        key = self.get_image_key(data, error_correction, image_format, module_size, quiet_zone_size, quality, mask_pattern)
+        image = self.get(key)
+        if image is None:
+            generator = QRCodeGenerator(data, error_correction, quality, mask_pattern)
+            generator.set_qr_code(self.encode(data, error_correction, quality, mask_pattern))
+            generator.add_quiet_zone(quiet_zone_size)
+
+            image = bytearray()
+            generator.render_qr_code(image, image_format, module_size)
+            image = bytes(image)
+            self.put(key, image)
+
+        return image
+
+    def get_stats(self):
+        # Counters of both tiers, number of entries and bytes in use
+        with self.lock:
+            stats = {tier: dict(counters) for tier, counters in self.counters.items()}
+            stats['entries'] = len(self.entries)
+            stats['bytes'] = self.size
+
+        return stats
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class QRCodeRequestHandler(BaseHTTPRequestHandler):
+    # GET /qr?data=...&ec=M&fmt=png|svg&scale=10, the symbols are generated by the server worker pool
+    # HTTP/1.1 keeps the connections alive between requests
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body are separate writes, with Nagle's algorithm the body would wait for the delayed ACK of the client
+    disable_nagle_algorithm = True
+
+    CONTENT_TYPES = {
+        'png': 'image/png',
+        'svg': 'image/svg+xml',
+    }
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != '/qr':
+            self.send_error(404)
+            return
+
+        query = parse_qs(url.query)
+        data = query.get('data', [None])[0]
+        error_correction = query.get('ec', ['M'])[0]
+        image_format = query.get('fmt', ['png'])[0]
+        module_size = query.get('scale', ['10'])[0]
+
+        # Invalid parameters are echoed as ASCII, send_error encodes its message in Latin-1
+        if data is None:
+            self.send_error(400, 'Missing data parameter')
+            return
+        if error_correction not in QRCodeGenerator.ERROR_CORRECTION_LEVEL_BITS:
+            self.send_error(400, f'Invalid error correction level: {error_correction!a}')
+            return
+        if image_format not in self.CONTENT_TYPES:
+            self.send_error(400, f'Invalid image format: {image_format!a}')
+            return
+        # Only ASCII digits: isdigit() also accepts superscripts such as '²', which int() rejects
+        if not (module_size.isascii() and module_size.isdecimal()) or not 1 <= int(module_size) <= 100:
+            self.send_error(400, f'Invalid scale: {module_size!a}')
+            return
+
+        # Repeated requests are answered from the image tier of the server cache
+        key = QRCodeCache.get_image_key(data, error_correction, image_format, int(module_size))
+        image = self.server.cache.get(key)
+        if image is None:
+            try:
+                image = self.server.pool.apply(QRCodeGenerator.generate_item, (data, error_correction, image_format, int(module_size)))
+            except ValueError as error:
+                self.send_error(400, str(error))
+                return
+            self.server.cache.put(key, image)
+
+        self.send_response(200)
+        self.send_header('Content-Type', self.CONTENT_TYPES[image_format])
+        self.send_header('Content-Length', str(len(image)))
+        self.end_headers()
+        self.wfile.write(image)
+
+    def log_message(self, format, *args):
+        # Requests are not logged, errors still are
         pass
 
 
+def serve(host='127.0.0.1', port=8000, workers=None, cache_bytes=64 * 1024 * 1024):
+    # Serve QR codes over HTTP until interrupted, with a cache of the rendered images
+    # The tables are built before the pool starts, so forked workers start warm, other start methods warm up once per worker
+    QRCodeGenerator.warm_up()
+    with Pool(workers, QRCodeGenerator.warm_up) as pool, ThreadingHTTPServer((host, port), QRCodeRequestHandler) as server:
+        server.pool = pool
+        server.cache = QRCodeCache(cache_bytes)
+        print(f'Serving QR codes on http://{host}:{server.server_port}/qr?data=...&ec=M&fmt=png', file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
 if __name__ == '__main__':
-    generator = QRCodeGenerator('HELLO WORLD', error_correction='M')
-    generator.determine_best_encoding_mode()
-    generator.determine_smallest_version()
-    print(generator.rs_encode_data())
+    if sys.argv[1:2] == ['serve']:
+        parser = argparse.ArgumentParser(prog='main.py serve', description='QR code generation HTTP service')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8000)
+        parser.add_argument('--workers', type=int, default=None, help='worker processes (default: number of CPUs)')
+        parser.add_argument('--cache-bytes', type=int, default=64 * 1024 * 1024, help='byte budget of the image cache')
+        arguments = parser.parse_args(sys.argv[2:])
+        serve(arguments.host, arguments.port, arguments.workers, arguments.cache_bytes)
+    else:
+        qr_code = QRCodeGenerator.encode('HELLO WORLD', error_correction='M')
+        print(f'Version {qr_code.version}-{qr_code.error_correction}, {qr_code.encoding_mode} mode, mask {qr_code.mask_pattern}')
+        print(QRCodeGenerator('HELLO WORLD', error_correction='M').get_text())
@@ -0,0 +1,519 @@
+# test_main.py
+
+import asyncio
+import re
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+from main import BitBuffer, QRCodeCache, QRCodeGenerator, QRCodeRequestHandler
+
+
+# Data and error correction code words of HELLO WORLD at 1-M (ISO/IEC 18004 Annex I example, 1 block)
+HELLO_WORLD_DATA_CODEWORDS = bytes((32, 91, 11, 120, 209, 114, 220, 77, 67, 64, 236, 17, 236, 17, 236, 17))
+HELLO_WORLD_ECC_CODEWORDS = bytes((196, 35, 39, 119, 235, 215, 231, 226, 93, 23))
+
+# HELLO WORLD 1-M symbol (mask 0), as produced by segno
+HELLO_WORLD_SYMBOL_ROWS = (
+    '111111100010101111111',
+    '100000101110001000001',
+    '101110100010101011101',
+    '101110100010101011101',
+    '101110101011101011101',
+    '100000100111001000001',
+    '111111101010101111111',
+    '000000000000000000000',
+    '101010100100100010010',
+    '011110001001000010001',
+    '000111111101001011000',
+    '111101011001110101110',
+    '010011110101001110101',
+    '000000001010001000101',
+    '111111100000100101100',
+    '100000100110001101000',
+    '101110101100101111111',
+    '101110100011010100010',
+    '101110101111011101001',
+    '100000100001110001011',
+    '111111101101011100001',
+)
+
+# Its PBM image at 1 pixel per module, with the 4 modules quiet zone
+HELLO_WORLD_PBM = b'P4\n29 29\n' + bytes.fromhex(
+    '000000000000000000000000000000000fe2bf80082e20800ba2ae800ba2ae800babae80082720800feabf8000000000'
+    '0aa489000789088001fd2c000f59d70004f53a80000a22800fe09600082634000bacbf800ba351000baf74800821c580'
+    '0fed708000000000000000000000000000000000'
+)
+
+# Version 7-Q symbol (6 blocks in 2 groups, version information blocks, mask 4), as produced by segno
+URL = 'https://github.com/R4yya/QR-Code-Generator/blob/main/README.md#usage-of-the-generator'
+URL_SYMBOL_ROWS = (
+    '111111100011111100010010001111100100101111111',
+    '100000100101100101011101010110001101001000001',
+    '101110101100101010110010100111101101001011101',
+    '101110100110100000001110001010010001101011101',
+    '101110101010101100001111111101110111101011101',
+    '100000101100000110101000111100011000001000001',
+    '111111101010101010101010101010101010101111111',
+    '000000000010011101001000111100001110100000000',
+    '010010101010101101101111100101101110110110100',
+    '110011001101010010111000101001101101101001011',
+    '100101100011111111011011111010100000011010110',
+    '011101011000001011111011000010101010111100010',
+    '000011110010110100010101101100001101100000000',
+    '101111000110100011010010101100101101101101010',
+    '110001101111101010010110100111101100101010000',
+    '010010011001011011100101110000001100110100001',
+    '110111111111001111001110010101001011011100111',
+    '011010011001000011000010011001110000101011110',
+    '111010100000010000011010101101111100101001010',
+    '100101001001100100101111111001011111011100010',
+    '010011111100011111001111110101101010111110001',
+    '010010001010111101101000100111101001100010000',
+    '100110101001111001011010100000101000101011010',
+    '011010001011101110101000110101101011100010010',
+    '110111111010011101001111111101101111111111000',
+    '111000001111010000010111100101100101000101011',
+    '011101110010000010101010001000111101010111110',
+    '010111010000001100110010000111011000001000000',
+    '001010111110000011110100010101101100100010001',
+    '100101011101100110000101000010101100001100110',
+    '110011111000011000101100110111110101010000100',
+    '000100000111001000011101000001001010001000001',
+    '000110100000100001110111001100001100100010011',
+    '110110001011011100100000111101100101101100110',
+    '000010101111011110100010100111100001010001100',
+    '011110000101101010010001101010101000001110001',
+    '100110111101011000011111101101001010111110011',
+    '000000001011010001001000101111101101100011110',
+    '111111100100011110111010111000000101101010010',
+    '100000100000111110111000110100001000100011010',
+    '101110101011100011011111100101101110111110001',
+    '101110100100011011100110010000101000011110001',
+    '101110100011101001100100010011110101000011010',
+    '100000101101000110010101111100011010010110000',
+    '111111100011101000011000111100101001000100001',
+)
+
+
+def get_rows(matrix):
+    return tuple(format(row, f'0{matrix.size}b') for row in matrix.rows())
+
+
+def get_image_rows(rows, scale, quiet_zone_size=4):
+    # Pixel rows ('1' for dark) of a symbol scaled with its quiet zone
+    width = len(rows[0]) + 2 * quiet_zone_size
+    quiet_rows = ['0' * width] * quiet_zone_size
+    image_rows = []
+    for row in quiet_rows + ['0' * quiet_zone_size + row + '0' * quiet_zone_size for row in rows] + quiet_rows:
+        image_rows += [''.join(pixel * scale for pixel in row)] * scale
+
+    return image_rows
+
+
+def render(data, error_correction, image_format, module_size):
+    image = bytearray()
+    QRCodeGenerator(data, error_correction).render_qr_code(image, image_format, module_size)
+    return bytes(image)
+
+
+def test_hello_world_codewords():
+    segments = QRCodeGenerator.get_optimal_segments(QRCodeGenerator.get_character_runs('HELLO WORLD'), 1)
+    data_codewords = QRCodeGenerator.get_data_codewords(segments, 1, 'M')
+    assert data_codewords == HELLO_WORLD_DATA_CODEWORDS
+    assert QRCodeGenerator.add_error_correction(data_codewords, 1, 'M') == HELLO_WORLD_DATA_CODEWORDS + HELLO_WORLD_ECC_CODEWORDS
+
+
+def test_hello_world_instance_pipeline():
+    # Calling sequence of the original generator
+    generator = QRCodeGenerator('HELLO WORLD', error_correction='M')
+    generator.determine_best_encoding_mode()
+    generator.determine_smallest_version()
+    assert generator.rs_encode_data() == HELLO_WORLD_DATA_CODEWORDS + HELLO_WORLD_ECC_CODEWORDS
+
+
+@pytest.mark.parametrize('data, encoding_mode', [
+    ('', 'numeric'),
+    ('0123', 'numeric'),
+    ('HELLO WORLD', 'alphanumeric'),
+    ('hello', 'byte'),
+    ('HELLO 0123456789012345 hello', 'mixed'),
+])
+def test_encoding_mode(data, encoding_mode):
+    assert QRCodeGenerator.encode(data, 'M').encoding_mode == encoding_mode
+
+    generator = QRCodeGenerator(data, 'M')
+    generator.determine_best_encoding_mode()
+    assert generator.encoding_mode == encoding_mode
+
+
+def test_kanji_segment_bits():
+    # ISO/IEC 18004 kanji example: mode 1000, count 2, then 0x0D9F and 0x1AAA in 13 bits each
+    segments = QRCodeGenerator.get_optimal_segments(QRCodeGenerator.get_character_runs('点茗'), 1)
+    assert segments == [('kanji', '点茗')]
+
+    bit_buffer = BitBuffer()
+    QRCodeGenerator.encode_data(bit_buffer, segments, 1)
+    assert len(bit_buffer) == 38
+    assert format(int.from_bytes(bit_buffer.to_bytearray(), 'big') >> 2, '038b') == '1000' '00000010' '0110110011111' '1101010101010'
+
+
+@pytest.mark.parametrize('data, segments', [
+    ('ABCDEF漢字', [('alphanumeric', 'ABCDEF'), ('kanji', '漢字')]),
+    ('漢字 QR コード 2024', [('kanji', '漢字'), ('alphanumeric', ' QR '), ('kanji', 'コード'), ('alphanumeric', ' 2024')]),
+    # Characters outside of Shift JIS go to byte mode
+    ('漢字😀', [('kanji', '漢字'), ('byte', '😀')]),
+])
+def test_kanji_segmentation(data, segments):
+    assert list(QRCodeGenerator.encode(data, 'M').segments) == segments
+
+
+def test_version_7_multi_block_symbol():
+    qr_code = QRCodeGenerator.encode(URL, 'Q')
+    assert (qr_code.version, qr_code.encoding_mode, qr_code.mask_pattern) == (7, 'byte', 4)
+    assert get_rows(qr_code.matrix) == URL_SYMBOL_ROWS
+
+
+def test_fixed_mask_symbol():
+    # The fixed profile emits the same symbol when given the mask pattern selected by the spec profile
+    assert get_rows(QRCodeGenerator.encode(URL, 'Q', 'fixed', 4).matrix) == URL_SYMBOL_ROWS
+
+
+def test_qr_code_is_hashable():
+    qr_code = QRCodeGenerator.encode(URL, 'Q')
+    assert hash(qr_code) == hash(QRCodeGenerator.encode(URL, 'Q'))
+    assert len({qr_code, QRCodeGenerator.encode(URL, 'Q'), QRCodeGenerator.encode(URL, 'L')}) == 2
+
+    # Writable matrices are not
+    with pytest.raises(TypeError):
+        hash(qr_code.matrix.copy())
+
+
+def test_threaded_encoding():
+    # Concurrent encode calls from a thread pool, starting with empty shared caches so that they are also built
+    # concurrently: the results must be the sequential ones, and the known answer must come out unchanged
+    payloads = [URL] + [f'{URL}?page={i}' for i in range(100)] + ['HELLO WORLD', '0123456789' * 20, '漢字' * 10]
+    expected = [QRCodeGenerator.encode(data, 'Q') for data in payloads]
+
+    for name, cache in vars(QRCodeGenerator).items():
+        if name.startswith('_') and isinstance(cache, dict):
+            cache.clear()
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda data: QRCodeGenerator.encode(data, 'Q'), payloads * 4))
+
+    assert results == expected * 4
+    assert get_rows(results[0].matrix) == URL_SYMBOL_ROWS
+
+
+def test_hello_world_symbol():
+    assert get_rows(QRCodeGenerator.encode('HELLO WORLD', 'M').matrix) == HELLO_WORLD_SYMBOL_ROWS
+
+
+def test_pbm_known_answer():
+    assert render('HELLO WORLD', 'M', 'pbm', 1) == HELLO_WORLD_PBM
+
+
+def test_bmp_rows():
+    # 87 pixels wide at scale 3: 11 bytes per row, padded to 12, rows stored bottom-up
+    image = render('HELLO WORLD', 'M', 'bmp', 3)
+    assert image[:2] == b'BM'
+    assert int.from_bytes(image[2:6], 'little') == len(image) == 62 + 12 * 87
+    assert int.from_bytes(image[18:22], 'little') == int.from_bytes(image[22:26], 'little') == 87
+
+    stored_rows = [image[62 + 12 * i:62 + 12 * (i + 1)] for i in range(87)]
+    assert all(row[11] == 0 for row in stored_rows)
+    pixel_rows = [format(int.from_bytes(row[:11], 'big'), '088b')[:87] for row in reversed(stored_rows)]
+    assert pixel_rows == get_image_rows(HELLO_WORLD_SYMBOL_ROWS, 3)
+
+
+def test_png_pixels():
+    image = render('HELLO WORLD', 'M', 'png', 2)
+    assert image[:8] == b'\x89PNG\r\n\x1a\n'
+
+    # Walk the chunks, checking their CRC
+    chunks = []
+    position = 8
+    while position < len(image):
+        length = int.from_bytes(image[position:position + 4], 'big')
+        chunk_type = image[position + 4:position + 8]
+        data = image[position + 8:position + 8 + length]
+        assert int.from_bytes(image[position + 8 + length:position + 12 + length], 'big') == zlib.crc32(chunk_type + data)
+        chunks.append((chunk_type, data))
+        position += 12 + length
+
+    assert chunks[0] == (b'IHDR', (58).to_bytes(4, 'big') * 2 + bytes((1, 0, 0, 0, 0)))
+    assert chunks[-1] == (b'IEND', b'')
+
+    # 1 bit grayscale scanlines with filter type 0, 0 is black
+    scanlines = zlib.decompress(b''.join(data for chunk_type, data in chunks if chunk_type == b'IDAT'))
+    assert len(scanlines) == 58 * 9
+    assert all(scanlines[y * 9] == 0 for y in range(58))
+    pixel_rows = [format(int.from_bytes(scanlines[y * 9 + 1:(y + 1) * 9], 'big') ^ (1 << 64) - 1, '064b')[:58] for y in range(58)]
+    assert pixel_rows == get_image_rows(HELLO_WORLD_SYMBOL_ROWS, 2)
+
+
+def test_svg_path():
+    svg = render('HELLO WORLD', 'M', 'svg', 10).decode()
+    assert svg.startswith('<svg xmlns="http://www.w3.org/2000/svg" width="290" height="290" viewBox="0 0 29 29">')
+
+    # Draw the 1 module wide horizontal strokes of the path
+    pixels = [['0'] * 29 for _ in range(29)]
+    x = y = 0
+    for command, arguments in re.findall(r'([Mmh])([-\d. ]+)', svg.split('stroke="#000" d="')[1]):
+        numbers = [float(number) for number in arguments.split()]
+        match command:
+            case 'M':
+                x, y = numbers
+            case 'm':
+                x, y = x + numbers[0], y + numbers[1]
+            case 'h':
+                for stroke_x in range(int(x), int(x + numbers[0])):
+                    pixels[int(y)][stroke_x] = '1'
+                x += numbers[0]
+
+    assert [''.join(row) for row in pixels] == get_image_rows(HELLO_WORLD_SYMBOL_ROWS, 1)
+
+
+@pytest.mark.parametrize('invert', (False, True))
+def test_text_lines(invert):
+    # Every character is two modules, the top one and the bottom one
+    lines = list(QRCodeGenerator('HELLO WORLD', 'M').iter_text_lines(invert))
+    glyphs = {' ': '00', '▄': '01', '▀': '10', '█': '11'}
+    top_rows = [''.join(glyphs[glyph][0] for glyph in line) for line in lines]
+    bottom_rows = [''.join(glyphs[glyph][1] for glyph in line) for line in lines]
+    image_rows = get_image_rows(HELLO_WORLD_SYMBOL_ROWS, 1) + ['0' * 29]
+    if invert:
+        image_rows = [row.translate(str.maketrans('01', '10')) for row in image_rows[:29]] + ['0' * 29]
+
+    assert top_rows == image_rows[0::2]
+    assert bottom_rows == image_rows[1::2]
+
+
+@pytest.mark.parametrize('workers', (1, 2))
+def test_generate_many(workers):
+    # Results in the order of the payloads, the same as one by one generation
+    payloads = [f'{URL}?page={i}' for i in range(20)] + [URL]
+    results = list(QRCodeGenerator.generate_many(payloads, 'Q', workers=workers, chunksize=4))
+    assert results == [QRCodeGenerator.encode(data, 'Q').matrix for data in payloads]
+    assert get_rows(results[-1]) == URL_SYMBOL_ROWS
+
+    images = list(QRCodeGenerator.generate_many(['HELLO WORLD'] * 3, 'M', 'pbm', workers=workers, module_size=1))
+    assert images == [HELLO_WORLD_PBM] * 3
+
+
+@pytest.mark.parametrize('error_correction, output', (('X', None), ('M', 'gif')))
+def test_generate_many_invalid_options(error_correction, output):
+    # Rejected by the call, before any worker starts
+    with pytest.raises(ValueError):
+        QRCodeGenerator.generate_many(['a'], error_correction, output, workers=2)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    # Thread pool counting the calls submitted to it
+    submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def test_agenerate():
+    async def generate(executor):
+        return [
+            await QRCodeGenerator.agenerate('HELLO WORLD', 'M', executor=executor),
+            await QRCodeGenerator.agenerate('\U0001f600' * 9, 'M', executor=executor),
+            await QRCodeGenerator.agenerate(URL, 'Q', executor=executor),
+            await QRCodeGenerator.agenerate('HELLO WORLD', 'M', 'pbm', 1, executor=executor),
+        ]
+
+    # Short payloads are generated inline, 36 UTF-8 bytes of emoji and images go to the executor
+    with CountingExecutor(2) as executor:
+        results = asyncio.run(generate(executor))
+        assert executor.submitted == 3
+
+    assert get_rows(results[0]) == HELLO_WORLD_SYMBOL_ROWS
+    assert results[1] == QRCodeGenerator.encode('\U0001f600' * 9, 'M').matrix
+    assert get_rows(results[2]) == URL_SYMBOL_ROWS
+    assert results[3] == HELLO_WORLD_PBM
+
+
+def test_agenerate_many():
+    # Results in the order of the payloads, whatever the order of completion
+    payloads = [f'{URL}?page={i}' for i in range(20)]
+
+    async def generate():
+        return [matrix async for matrix in QRCodeGenerator.agenerate_many(payloads, 'Q', concurrency=3)]
+
+    assert asyncio.run(generate()) == [QRCodeGenerator.encode(data, 'Q').matrix for data in payloads]
+
+
+@pytest.mark.parametrize('executor_class', (ThreadPoolExecutor, ProcessPoolExecutor))
+def test_aiter_image(executor_class):
+    # Chunks of chunk_size bytes (the last one shorter) that make up the whole image,
+    # streamed from a thread pool and cut from the image of a process pool
+    image = render(URL, 'Q', 'png', 7)
+
+    async def iter_image(executor):
+        return [chunk async for chunk in QRCodeGenerator.aiter_image(URL, 'png', 'Q', 7, executor, 1000)]
+
+    with executor_class(1) as executor:
+        chunks = asyncio.run(iter_image(executor))
+
+    assert b''.join(chunks) == image
+    assert [len(chunk) for chunk in chunks] == [1000] * (len(image) // 1000) + [len(image) % 1000]
+
+
+def test_aiter_image_errors():
+    # A rendering error is raised by the iteration, leaving it early stops the rendering
+    async def iter_image():
+        with pytest.raises(ValueError):
+            async for _ in QRCodeGenerator.aiter_image('HELLO WORLD', 'gif'):
+                pass
+
+        chunks = QRCodeGenerator.aiter_image('HELLO WORLD', 'bmp', 'M', 40, chunk_size=100)
+        chunk = await anext(chunks)
+        await chunks.aclose()
+        return chunk
+
+    assert len(asyncio.run(iter_image())) == 100
+
+def test_render_into_bytes():
+    # 8 bits per pixel at (5, 3) in a larger buffer, pixels around the symbol untouched
+    stride = 40
+    buffer = bytearray(b'\x07' * stride * 35)
+    QRCodeGenerator('HELLO WORLD', 'M').render_into(buffer, stride, 5, 3, scale=1, dark=1, light=2)
+
+    expected = [['7'] * stride for _ in range(35)]
+    for y, row in enumerate(get_image_rows(HELLO_WORLD_SYMBOL_ROWS, 1)):
+        expected[3 + y][5:5 + 29] = row.translate(str.maketrans('01', '21'))
+    assert [''.join(map(str, buffer[y * stride:(y + 1) * stride])) for y in range(35)] == [''.join(row) for row in expected]
+
+
+def test_render_into_bits():
+    # 1 bit per pixel at an x that is not byte aligned: the bits around the symbol are kept
+    stride = 12
+    background = bytes(range(256)) * 3
+    buffer = bytearray(background)
+    QRCodeGenerator('HELLO WORLD', 'M').render_into(buffer, stride, 13, 2, scale=2, bits_per_pixel=1, dark=1, light=0)
+
+    pixel_rows = [format(int.from_bytes(buffer[y * stride:(y + 1) * stride], 'big'), f'0{stride * 8}b') for y in range(64)]
+    background_rows = [format(int.from_bytes(background[y * stride:(y + 1) * stride], 'big'), f'0{stride * 8}b') for y in range(64)]
+    image_rows = get_image_rows(HELLO_WORLD_SYMBOL_ROWS, 2)
+    for y in range(64):
+        if 2 <= y < 60:
+            assert pixel_rows[y] == background_rows[y][:13] + image_rows[y - 2] + background_rows[y][13 + 58:]
+        else:
+            assert pixel_rows[y] == background_rows[y]
+
+
+def test_render_into_does_not_fit():
+    with pytest.raises(ValueError):
+        QRCodeGenerator('HELLO WORLD', 'M').render_into(bytearray(28 * 29), 28, scale=1)
+
+
+def test_cache_lru_order():
+    # A get makes an entry the most recently used: the next eviction takes the oldest of the others
+    keys = [QRCodeCache.get_image_key(data) for data in 'abcd']
+    entry_size = QRCodeCache.get_entry_size(keys[0], bytes(100))
+    cache = QRCodeCache(3 * entry_size)
+    for key in keys[:3]:
+        cache.put(key, bytes(100))
+
+    assert cache.get(keys[0]) == bytes(100)
+    cache.put(keys[3], bytes(100))
+    assert cache.get(keys[1]) is None
+    assert all(cache.get(key) == bytes(100) for key in (keys[0], keys[2], keys[3]))
+
+
+def test_cache_byte_budget():
+    # Both tiers share the budget, evictions are counted in the tier of the evicted entry
+    qr_code = QRCodeGenerator.encode('HELLO WORLD', 'M')
+    matrix_key = QRCodeCache.get_matrix_key('HELLO WORLD', 'M')
+    image_keys = [QRCodeCache.get_image_key(f'{i:03}') for i in range(10)]
+    image_size = QRCodeCache.get_entry_size(image_keys[0], bytes(1000))
+    cache = QRCodeCache(QRCodeCache.get_entry_size(matrix_key, qr_code) + 4 * image_size)
+    cache.put(matrix_key, qr_code)
+    for key in image_keys:
+        cache.put(key, bytes(1000))
+        assert cache.get_stats()['bytes'] <= cache.max_bytes
+
+    stats = cache.get_stats()
+    assert stats['entries'] == 4
+    assert stats['bytes'] == 4 * image_size
+    assert stats['matrix']['evictions'] == 1
+    assert stats['image']['evictions'] == 6
+    assert cache.get(matrix_key) is None
+    assert [cache.get(key) is not None for key in image_keys] == [False] * 6 + [True] * 4
+
+
+def test_cache_oversized_entry():
+    # A value larger than the whole budget is not stored and evicts nothing
+    small_key, large_key = QRCodeCache.get_image_key('a'), QRCodeCache.get_image_key('b')
+    cache = QRCodeCache(QRCodeCache.get_entry_size(small_key, bytes(100)) + 100)
+    cache.put(small_key, bytes(100))
+    cache.put(large_key, bytes(1000))
+
+    assert cache.get(large_key) is None
+    assert cache.get(small_key) == bytes(100)
+    assert cache.get_stats()['entries'] == 1
+    assert cache.get_stats()['image']['evictions'] == 0
+
+
+def test_cache_counters():
+    # A rendering miss encodes through the matrix tier, hits are served without generation
+    cache = QRCodeCache()
+    image = render('HELLO WORLD', 'M', 'svg', 3)
+    assert cache.render('HELLO WORLD', 'M', 'svg', 3) == image
+    assert cache.render('HELLO WORLD', 'M', 'svg', 3) == image
+    assert get_rows(cache.encode('HELLO WORLD', 'M').matrix) == HELLO_WORLD_SYMBOL_ROWS
+    assert cache.render('HELLO WORLD', 'M', 'pbm', 1) == HELLO_WORLD_PBM
+
+    stats = cache.get_stats()
+    assert stats['matrix'] == {'hits': 2, 'misses': 1, 'evictions': 0}
+    assert stats['image'] == {'hits': 1, 'misses': 2, 'evictions': 0}
+    assert stats['entries'] == 3
+
+    cache.clear()
+    assert cache.get_stats()['entries'] == cache.get_stats()['bytes'] == 0
+
+@pytest.fixture
+def server():
+    # The service of serve() on a free port, with a thread pool in place of the worker processes
+    with ThreadPool(1) as pool, ThreadingHTTPServer(('127.0.0.1', 0), QRCodeRequestHandler) as server:
+        server.pool = pool
+        server.cache = QRCodeCache(1024 * 1024)
+        thread = threading.Thread(target=server.serve_forever, args=(0.01,))
+        thread.start()
+        yield server
+        server.shutdown()
+        thread.join()
+
+
+def get(server, path):
+    connection = HTTPConnection('127.0.0.1', server.server_port)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def test_server_image(server):
+    image = render('HELLO WORLD', 'M', 'svg', 3)
+    assert get(server, '/qr?data=HELLO%20WORLD&ec=M&fmt=svg&scale=3') == (200, image)
+    assert get(server, '/qr?data=HELLO%20WORLD&ec=M&fmt=svg&scale=3') == (200, image)
+    assert server.cache.get_stats()['image']['hits'] == 1
+
+
+@pytest.mark.parametrize('query', ('ec=M', 'data=a&ec=X', 'data=a&ec=%D9%A3', 'data=a&fmt=gif', 'data=a&scale=0', 'data=a&scale=101', 'data=a&scale=%C2%B2', 'data=a&scale=%D9%A3'))
+def test_server_invalid_parameters(server, query):
+    # Rejected with a 400, the handler thread keeps serving
+    assert get(server, f'/qr?{query}')[0] == 400
+    assert get(server, '/qr?data=a&scale=1')[0] == 200